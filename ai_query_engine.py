@@ -2,13 +2,214 @@
 AI Query Engine - Universal Question Answering System
 Uses knowledge base + AI to answer ANY analytical question about services
 """
+import asyncio
+import atexit
+import hashlib
+import heapq
 import json
+import operator
 import re
-from typing import Dict, List, Any, Optional
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Callable, Dict, Iterator, List, Any, Optional
+from config.settings import config
+from llm.response_generator import AIResponseGenerator, get_ollama_session
+from service_knowledge_base import METRIC_FIELDS
+from utils.cache import TTLCache
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Keyword groups used by the pattern router (matched as substrings, like "fail" in "failure")
+_RANK_WORDS = frozenset({'highest', 'worst', 'most', 'top'})
+_FAILURE_WORDS = frozenset({'failure', 'fail'})
+_SLOW_WORDS = frozenset({'slow', 'response'})
+_UNHEALTHY_WORDS = frozenset({'unhealthy', 'bad'})
+_BEST_WORDS = frozenset({'best', 'healthiest', 'lowest'})
+_OVERVIEW_WORDS = frozenset({'overview', 'summary', 'today', 'all', 'everything', 'status'})
+_OVERVIEW_TOPICS = frozenset({'health', 'status', 'overview'})
+_FILTER_WORDS = frozenset({'with', 'having'})
+_PROBLEM_WORDS = frozenset({'problem', 'issue'})
+_LIST_WORDS = frozenset({'show', 'list', 'which'})
+_COUNT_WORDS = frozenset({'how many', 'count'})
+_OTHER_WORDS = frozenset({'error', 'health', 'critical', 'warning'})
+
+_KEYWORDS = (
+    _RANK_WORDS | _FAILURE_WORDS | _SLOW_WORDS | _UNHEALTHY_WORDS | _BEST_WORDS
+    | _OVERVIEW_WORDS | _OVERVIEW_TOPICS | _FILTER_WORDS | _PROBLEM_WORDS
+    | _LIST_WORDS | _COUNT_WORDS | _OTHER_WORDS
+)
+
+# One scan finds every keyword occurrence: the lookahead lets matches overlap, and the
+# longest keyword at a position also reports the shorter keywords it contains
+# (e.g. "unhealthy" -> {"unhealthy", "health"}).
+_KEYWORD_RE = re.compile(
+    "(?=(%s))" % "|".join(re.escape(k) for k in sorted(_KEYWORDS, key=len, reverse=True))
+)
+_KEYWORD_CLOSURE = {
+    keyword: frozenset(k for k in _KEYWORDS if k in keyword)
+    for keyword in _KEYWORDS
+}
+_NUMBER_RE = re.compile(r'\d+')
+
+# One line of AI context per ranked service
+RANK_FMT = (
+    "{i}. {name}: health={health}, status={status}, "
+    "errors={ec}, response={rt}ms, failure={fr}%, problems={pc}"
+)
+
+STATUS_EMOJI = {'healthy': '🟢', 'warning': '⚠️', 'critical': '🔴'}
+_EMOJI_GET = STATUS_EMOJI.get
+
+# Display labels for metrics ("failure_rate" -> "failure rate")
+METRIC_LABEL = {
+    m: m.replace('_', ' ')
+    for m in METRIC_FIELDS + ('health_score', 'problem_count')
+}
+
+def _metric_label(metric: str) -> str:
+    """Get display label for a metric"""
+    label = METRIC_LABEL.get(metric)
+    return label if label is not None else metric.replace('_', ' ')
+
+# Condition fields stored under record['metrics']
+_METRIC_UNDER_METRICS = frozenset(METRIC_FIELDS)
+
+def _match_keywords(text: str) -> frozenset:
+    """Return all router keywords contained in text (single regex pass)"""
+    hits = set()
+    for match in _KEYWORD_RE.finditer(text):
+        hits |= _KEYWORD_CLOSURE[match.group(1)]
+    return frozenset(hits)
+
+_STATUS_CONDITION_RE = re.compile(r"status == ['\"](\w+)['\"]")
+
+def _parse_condition(condition: str) -> Optional[tuple]:
+    """
+    Parse a filter condition once into (op, field, value)
+    
+    Supports "status == 'critical'", "error_count > 100" and "response_time < 200".
+    Returns None for anything else.
+    """
+    condition = condition.strip()
+    
+    if "status ==" in condition:
+        match = _STATUS_CONDITION_RE.search(condition)
+        return ('==', 'status', match.group(1)) if match else None
+    
+    for op in ('>', '<'):
+        if op in condition:
+            metric, _, threshold = condition.partition(op)
+            try:
+                return (op, metric.strip(), float(threshold.strip()))
+            except ValueError:
+                return None
+    
+    return None
+
+# Static so providers can prefix-cache it; only the question varies per call
+PARSE_SYSTEM_PROMPT = """You are a query parser for a Dynatrace monitoring system.
+Convert the question to a query as compact JSON:
+{"a":"rank|filter|aggregate|compare|count","m":"metric","o":"desc|asc","c":"field op value","l":limit,"s":["service"]}
+
+Metrics: health_score, failure_rate, error_count, response_time, problem_count
+Statuses: healthy, warning, critical
+
+Examples:
+"Which has highest failure?" -> {"a":"rank","m":"failure_rate","o":"desc","l":5}
+"Show critical services" -> {"a":"filter","c":"status == 'critical'"}"""
+
+ANSWER_SYSTEM_PROMPT = """You are a friendly Dynatrace monitoring assistant.
+Generate natural, conversational answers based on the data provided.
+Be concise but informative. Use emojis sparingly for emphasis."""
+
+# Abbreviated keys used in PARSE_SYSTEM_PROMPT -> canonical query keys
+_QUERY_KEYS = {'a': 'action', 'm': 'metric', 'o': 'order', 'c': 'condition', 'l': 'limit', 's': 'services'}
+
+def _nullable(schema: Dict) -> Dict:
+    """Allow null in addition to schema"""
+    return {'anyOf': [schema, {'type': 'null'}]}
+
+# Structured output schema for AI parsing (strict mode: every key required, unused ones null)
+QUERY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'a': {'type': 'string', 'enum': ['rank', 'filter', 'aggregate', 'compare', 'count']},
+        'm': _nullable({'type': 'string', 'enum': ['health_score', 'failure_rate', 'error_count',
+                                                   'response_time', 'problem_count']}),
+        'o': _nullable({'type': 'string', 'enum': ['desc', 'asc']}),
+        'c': _nullable({'type': 'string'}),
+        'l': _nullable({'type': 'integer'}),
+        's': _nullable({'type': 'array', 'items': {'type': 'string'}}),
+    },
+    'required': ['a', 'm', 'o', 'c', 'l', 's'],
+    'additionalProperties': False,
+}
+
+def _expand_query(raw: Dict) -> Dict:
+    """Map abbreviated AI parse output back to canonical query keys, dropping null fields"""
+    return {_QUERY_KEYS.get(key, key): value for key, value in raw.items() if value is not None}
+
+def _json_object(text: str) -> str:
+    """Cut the outermost {...} out of a reply (plain-prompt models may wrap it in prose or fences)"""
+    start, end = text.find('{'), text.rfind('}')
+    return text[start:end + 1] if start != -1 and end > start else text
+
+def _is_bad_request(error: Exception) -> bool:
+    """True if a provider rejected the request itself (HTTP 400), e.g. an unsupported parameter"""
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return status == 400 or 'error: 400' in str(error)
+
+def _normalize_question(question: str) -> str:
+    """Normalize a question for cache lookups (case, whitespace, trailing punctuation)"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+class _ProviderState:
+    """Rolling latency window and circuit breaker for one AI provider"""
+    
+    FAILURE_THRESHOLD = 3  # consecutive failures before the circuit opens
+    OPEN_SECONDS = 30
+    
+    def __init__(self, generator):
+        self.generator = generator
+        self.latencies = deque(maxlen=100)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+    
+    @property
+    def name(self) -> str:
+        return self.generator.provider
+    
+    def is_available(self) -> bool:
+        """False while the circuit is open"""
+        return time.monotonic() >= self.open_until
+    
+    def hedge_delay(self) -> float:
+        """Seconds to wait before hedging: 2x rolling p50 latency"""
+        with self._lock:
+            if not self.latencies:
+                return config.AI_HEDGE_DEFAULT_DELAY
+            p50 = statistics.median(self.latencies)
+        return max(2 * p50, 0.5)
+    
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.consecutive_failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + self.OPEN_SECONDS
+                self.consecutive_failures = 0
+                logger.warning(f"AI provider {self.name} failing, skipping it for {self.OPEN_SECONDS}s")
+
 class AIQueryEngine:
     """
     Intelligent query engine that can answer analytical questions
@@ -18,6 +219,35 @@ class AIQueryEngine:
     def __init__(self, knowledge_base, ai_generator):
         self.kb = knowledge_base
         self.ai = ai_generator
+        
+        # Answers only depend on the question and the KB data version
+        self.answer_cache = TTLCache(
+            maxsize=config.ANSWER_CACHE_SIZE,
+            ttl=config.ANSWER_CACHE_TTL
+        )
+        self._cache_version = None
+        
+        # Parsed queries don't depend on KB data, so they outlive answer cache entries
+        self.parse_cache = TTLCache(maxsize=4096, ttl=config.PARSE_CACHE_TTL)
+        
+        # Primary provider first, then any other configured provider as fallback
+        self._providers = self._build_provider_chain()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-hedge")
+        self._no_structured_output = set()  # (provider, model) that reject structured output
+        
+        # Keep-alive connection pool for Ollama, shared with the response generators
+        self._http = get_ollama_session()
+        
+        # Keep local Ollama models loaded so the first real question skips the model load
+        self._stop_warming = threading.Event()
+        if config.AI_PREFIX_WARM_INTERVAL > 0 and any(p.name == 'ollama' for p in self._providers):
+            threading.Thread(target=self._warm_local_models, name="ai-model-warm", daemon=True).start()
+        atexit.register(self.close)
+    
+    def close(self):
+        """Stop the warm-up thread and release the worker pool (the shared Ollama session stays open)"""
+        self._stop_warming.set()
+        self._hedge_pool.shutdown(wait=False)
     
     def answer_question(self, question: str) -> Dict[str, Any]:
         """
@@ -39,24 +269,35 @@ class AIQueryEngine:
                 'data': None
             }
         
+        # Serve repeated questions without another AI round trip
+        # One build answers the whole question, even if a newer one lands meanwhile
+        kb_data = self.kb.current_data()
+        cache_key = self._answer_cache_key(question, kb_data.version)
+        cached = self.answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Answer cache hit ({self.answer_cache.stats()})")
+            return cached
+        
         try:
             # Step 1: Parse question to structured query
             query = self._parse_question_to_query(question)
             logger.info(f"Parsed query: {query}")
             
             # Step 2: Execute query on knowledge base
-            data = self._execute_query(query)
+            data = self._execute_query(query, kb_data)
             logger.info(f"Query returned {len(data) if isinstance(data, list) else 'aggregate'} results")
             
             # Step 3: Generate natural language answer
             answer = self._generate_answer(question, query, data)
             
-            return {
+            result = {
                 'answer': answer,
                 'status': 'success',
                 'data': data,
                 'query_type': query.get('action')
             }
+            self.answer_cache.set(cache_key, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error answering question: {e}", exc_info=True)
@@ -67,6 +308,115 @@ class AIQueryEngine:
                 'error': str(e)
             }
     
+    async def answer_question_async(self, question: str) -> Dict[str, Any]:
+        """
+        Async variant of answer_question
+        
+        The provider SDK calls are blocking, so the pipeline runs on a worker
+        thread and the event loop stays free to serve other questions.
+        """
+        return await asyncio.to_thread(self.answer_question, question)
+    
+    async def answer_questions(
+        self,
+        questions: List[str],
+        max_concurrency: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer several questions concurrently
+        
+        Args:
+            questions: Natural language questions
+            max_concurrency: In-flight questions at once (defaults to AI_MAX_CONCURRENCY,
+                             keep it within the provider's rate limit)
+            
+        Returns:
+            Results in the same order as questions
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or config.AI_MAX_CONCURRENCY)
+        
+        async def answer_one(question):
+            async with semaphore:
+                return await self.answer_question_async(question)
+        
+        return await asyncio.gather(*(answer_one(q) for q in questions))
+    
+    def answer_question_stream(self, question: str) -> Iterator[str]:
+        """
+        Answer a question, yielding the answer text as it is generated
+        
+        The query is parsed and executed first (both are fast or small),
+        then the AI answer is streamed token by token so the first words
+        show up without waiting for the full completion.
+        
+        Args:
+            question: Natural language question
+            
+        Yields:
+            Answer text chunks
+        """
+        logger.info(f"Processing question (streaming): {question}")
+        
+        if not self.kb.is_ready():
+            yield "I'm still gathering data from all services. Please wait a moment..."
+            return
+        
+        # One build answers the whole question, even if a newer one lands meanwhile
+        kb_data = self.kb.current_data()
+        cache_key = self._answer_cache_key(question, kb_data.version)
+        cached = self.answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Answer cache hit ({self.answer_cache.stats()})")
+            yield cached['answer']
+            return
+        
+        try:
+            query = self._parse_question_to_query(question)
+            logger.info(f"Parsed query: {query}")
+            data = self._execute_query(query, kb_data)
+        except Exception as e:
+            logger.error(f"Error answering question: {e}", exc_info=True)
+            yield "I had trouble processing that question. Could you rephrase it?"
+            return
+        
+        chunks = []
+        if self.ai.provider != 'fallback' and not self._is_trivial(query.get('action'), data):
+            try:
+                system_prompt, user_prompt = self._answer_prompts(
+                    question, self._build_answer_context(query, data)
+                )
+                for chunk in self._stream_ai(system_prompt, user_prompt):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                logger.warning(f"AI answer streaming failed: {e}")
+                if chunks:
+                    # Part of the answer is already on screen - don't append a second one
+                    return
+        
+        if chunks:
+            answer = "".join(chunks)
+        else:
+            answer = self._generate_template_answer(question, query, data)
+            yield answer
+        
+        self.answer_cache.set(cache_key, {
+            'answer': answer,
+            'status': 'success',
+            'data': data,
+            'query_type': query.get('action')
+        })
+    
+    def _answer_cache_key(self, question: str, kb_version: int) -> str:
+        """Build answer cache key from normalized question + KB version"""
+        if kb_version != self._cache_version:
+            # KB was rebuilt - every cached answer is stale
+            self.answer_cache.clear()
+            self._cache_version = kb_version
+        
+        raw = f"{_normalize_question(question)}|{kb_version}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
     def _parse_question_to_query(self, question: str) -> Dict:
         """
         Parse natural language question to structured query using AI
@@ -81,54 +431,56 @@ class AIQueryEngine:
     
     def _pattern_match_query(self, question: str) -> Optional[Dict]:
         """Fast pattern matching for common query types"""
-        q_lower = question.lower()
+        hits = _match_keywords(question.lower())
+        if not hits:
+            return None
         
         # Ranking queries
-        if any(word in q_lower for word in ['highest', 'worst', 'most', 'top']):
-            if 'failure' in q_lower or 'fail' in q_lower:
+        if not hits.isdisjoint(_RANK_WORDS):
+            if not hits.isdisjoint(_FAILURE_WORDS):
                 return {'action': 'rank', 'metric': 'failure_rate', 'order': 'desc', 'limit': 5}
-            elif 'error' in q_lower:
+            elif 'error' in hits:
                 return {'action': 'rank', 'metric': 'error_count', 'order': 'desc', 'limit': 5}
-            elif 'slow' in q_lower or 'response' in q_lower:
+            elif not hits.isdisjoint(_SLOW_WORDS):
                 return {'action': 'rank', 'metric': 'response_time', 'order': 'desc', 'limit': 5}
-            elif 'problem' in q_lower:
+            elif 'problem' in hits:
                 return {'action': 'rank', 'metric': 'problem_count', 'order': 'desc', 'limit': 5}
-            elif 'unhealthy' in q_lower or 'bad' in q_lower:
+            elif not hits.isdisjoint(_UNHEALTHY_WORDS):
                 return {'action': 'rank', 'metric': 'health_score', 'order': 'asc', 'limit': 5}
         
         # Best/healthiest queries
-        if any(word in q_lower for word in ['best', 'healthiest', 'lowest']):
-            if 'health' in q_lower:
+        if not hits.isdisjoint(_BEST_WORDS):
+            if 'health' in hits:
                 return {'action': 'rank', 'metric': 'health_score', 'order': 'desc', 'limit': 5}
-            elif 'error' in q_lower:
+            elif 'error' in hits:
                 return {'action': 'rank', 'metric': 'error_count', 'order': 'asc', 'limit': 5}
         
         # Overview/summary queries
-        if any(word in q_lower for word in ['overview', 'summary', 'today', 'all', 'everything', 'status']):
-            if 'health' in q_lower or 'status' in q_lower or 'overview' in q_lower:
+        if not hits.isdisjoint(_OVERVIEW_WORDS):
+            if not hits.isdisjoint(_OVERVIEW_TOPICS):
                 return {'action': 'aggregate', 'scope': 'all'}
         
         # Filter queries
-        if 'with' in q_lower or 'having' in q_lower:
-            if 'problem' in q_lower or 'issue' in q_lower:
+        if not hits.isdisjoint(_FILTER_WORDS):
+            if not hits.isdisjoint(_PROBLEM_WORDS):
                 return {'action': 'filter', 'condition': 'problem_count > 0'}
-            elif 'error' in q_lower:
+            elif 'error' in hits:
                 # Extract number if present
-                numbers = re.findall(r'\d+', question)
-                threshold = int(numbers[0]) if numbers else 100
+                number = _NUMBER_RE.search(question)
+                threshold = int(number.group()) if number else 100
                 return {'action': 'filter', 'condition': f'error_count > {threshold}'}
         
         # List queries
-        if any(word in q_lower for word in ['show', 'list', 'which']):
-            if 'critical' in q_lower:
+        if not hits.isdisjoint(_LIST_WORDS):
+            if 'critical' in hits:
                 return {'action': 'filter', 'condition': "status == 'critical'"}
-            elif 'warning' in q_lower:
+            elif 'warning' in hits:
                 return {'action': 'filter', 'condition': "status == 'warning'"}
-            elif 'problem' in q_lower:
+            elif 'problem' in hits:
                 return {'action': 'filter', 'condition': 'problem_count > 0'}
         
         # Count queries
-        if any(word in q_lower for word in ['how many', 'count']):
+        if not hits.isdisjoint(_COUNT_WORDS):
             return {'action': 'count', 'scope': 'all'}
         
         return None
@@ -136,224 +488,396 @@ class AIQueryEngine:
     def _ai_parse_query(self, question: str) -> Dict:
         """Use AI to parse complex questions"""
         
-        system_prompt = """You are a query parser for a Dynatrace monitoring system.
-Convert natural language questions to structured queries.
-
-Available query types:
-1. rank - Sort services by a metric
-2. filter - Filter services by condition
-3. aggregate - Get overall statistics
-4. compare - Compare specific services
-5. count - Count services matching criteria
-
-Available metrics: health_score, failure_rate, error_count, response_time, problem_count
-Available statuses: healthy, warning, critical
-
-Return ONLY valid JSON, no other text:
-{
-  "action": "rank|filter|aggregate|compare|count",
-  "metric": "metric_name",
-  "order": "desc|asc",
-  "condition": "expression",
-  "limit": number,
-  "services": ["service1", "service2"]
-}"""
+        if self.ai.provider == 'fallback':
+            # Fallback to pattern matching
+            return {'action': 'aggregate', 'scope': 'all'}
         
-        user_prompt = f"""Question: "{question}"
-
-Examples:
-"Which has highest failure?" -> {{"action":"rank","metric":"failure_rate","order":"desc","limit":5}}
-"Services with errors>100" -> {{"action":"filter","condition":"error_count > 100"}}
-"What's today's health?" -> {{"action":"aggregate","scope":"all"}}
-"Show critical services" -> {{"action":"filter","condition":"status == 'critical'"}}
-
-Convert the question to query JSON:"""
+        user_prompt = f'Question: "{question}"\nJSON:'
+        
+        # Keyed on the question alone: any provider in the chain (hedged or
+        # fallback) answers the same QUERY_SCHEMA, so a parse is provider-agnostic
+        cache_key = _normalize_question(question)
+        cached = self.parse_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Parse cache hit")
+            return dict(cached)
         
         try:
-            if self.ai.provider == 'fallback':
-                # Fallback to pattern matching
-                return {'action': 'aggregate', 'scope': 'all'}
-            
-            response = self._call_ai(system_prompt, user_prompt)
-            
-            # Clean response
-            response = response.strip()
-            response = re.sub(r'^```json\s*', '', response)
-            response = re.sub(r'```\s*$', '', response)
-            
-            query = json.loads(response)
+            response = self._call_ai(PARSE_SYSTEM_PROMPT, user_prompt, schema=QUERY_SCHEMA)
+            query = _expand_query(json.loads(_json_object(response)))
+            self.parse_cache.set(cache_key, dict(query))
             return query
             
         except Exception as e:
             logger.warning(f"AI parsing failed, using fallback: {e}")
             return {'action': 'aggregate', 'scope': 'all'}
     
-    def _call_ai(self, system_prompt: str, user_prompt: str) -> str:
-        """Call AI provider"""
+    def _warm_local_models(self):
+        """
+        Load every Ollama model now, then again every AI_PREFIX_WARM_INTERVAL
+        
+        An /api/generate request without a prompt only loads the model (no
+        tokens generated). Hosted providers are never pinged: they have no
+        load step, and our system prompts are too short for prefix caching.
+        """
+        while True:
+            for state in self._providers:
+                if state.name != 'ollama' or not state.is_available():
+                    continue
+                ai = state.generator
+                try:
+                    self._http.post(f"{ai.client}/api/generate", json={"model": ai.model}, timeout=30)
+                except Exception as e:
+                    logger.debug(f"Model warm-up failed for {state.name}: {e}")
+            
+            if self._stop_warming.wait(config.AI_PREFIX_WARM_INTERVAL):
+                return
+    
+    def _build_provider_chain(self) -> List[_ProviderState]:
+        """Build ordered provider list: the engine's generator, then other configured providers"""
+        chain = [_ProviderState(self.ai)]
+        if self.ai.provider == 'fallback':
+            return chain
+        
+        configured = {
+            'gemini': bool(config.GEMINI_API_KEY),
+            'ollama': config.OLLAMA_ENABLED,
+            'anthropic': bool(config.ANTHROPIC_API_KEY),
+            'openai': bool(config.OPENAI_API_KEY),
+        }
+        for provider, enabled in configured.items():
+            if not enabled or provider == self.ai.provider:
+                continue
+            generator = AIResponseGenerator(provider)
+            if generator.provider != 'fallback':
+                chain.append(_ProviderState(generator))
+        
+        logger.info(f"AI provider chain: {[p.name for p in chain]}")
+        return chain
+    
+    def _call_ai(self, system_prompt: str, user_prompt: str, schema: Optional[Dict] = None) -> str:
+        """
+        Call AI provider with fallback and hedging
+        
+        The first available provider gets the request. If it hasn't answered
+        within 2x its p50 latency, the next provider is asked as well and the
+        first successful reply wins. Errors fail over immediately.
+        """
+        providers = [p for p in self._providers if p.is_available()] or self._providers[:1]
+        primary = providers[0]
+        if len(providers) == 1:
+            return self._timed_call(primary, system_prompt, user_prompt, schema)
+        secondary = providers[1]
+        
+        first = self._hedge_pool.submit(self._timed_call, primary, system_prompt, user_prompt, schema)
+        try:
+            return first.result(timeout=primary.hedge_delay())
+        except FuturesTimeout:
+            logger.info(f"{primary.name} is slow, hedging with {secondary.name}")
+        except Exception as e:
+            logger.warning(f"{primary.name} failed ({e}), falling back to {secondary.name}")
+            return self._timed_call(secondary, system_prompt, user_prompt, schema)
+        
+        second = self._hedge_pool.submit(self._timed_call, secondary, system_prompt, user_prompt, schema)
+        pending = {first, second}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+        raise last_error
+    
+    def _timed_call(self, state: _ProviderState, system_prompt: str, user_prompt: str,
+                    schema: Optional[Dict] = None) -> str:
+        """Call one provider, recording latency or failure"""
+        start = time.monotonic()
+        try:
+            result = self._call_provider(state.generator, system_prompt, user_prompt, schema)
+        except Exception:
+            state.record_failure()
+            raise
+        state.record_success(time.monotonic() - start)
+        return result
+    
+    def _call_provider(self, ai, system_prompt: str, user_prompt: str,
+                       schema: Optional[Dict] = None) -> str:
+        """
+        Call a specific AI provider
+        
+        With a JSON schema, the provider's structured output mode is tried
+        first. Models that reject it (gpt-3.5-turbo, gemini-pro, Ollama < 0.5)
+        are retried once with the plain prompt, which asks for JSON too, and
+        are remembered so later calls skip straight to the plain prompt.
+        """
+        model_key = (ai.provider, ai.model)
+        if schema is not None and model_key not in self._no_structured_output:
+            try:
+                return self._request_provider(ai, system_prompt, user_prompt, schema)
+            except Exception as e:
+                if not _is_bad_request(e):
+                    raise
+                logger.warning(
+                    f"{ai.provider} model {ai.model} rejected structured output ({e}); "
+                    "using plain JSON prompts for it from now on"
+                )
+                self._no_structured_output.add(model_key)
+        return self._request_provider(ai, system_prompt, user_prompt)
+    
+    def _request_provider(self, ai, system_prompt: str, user_prompt: str,
+                          schema: Optional[Dict] = None) -> str:
+        """Send one request to a provider (schema = use its structured output mode)"""
+        provider = ai.provider
+        
+        if provider == 'openai':
+            extra = {}
+            if schema:
+                extra['response_format'] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": "query", "schema": schema, "strict": True}
+                }
+            response = ai.client.chat.completions.create(
+                model=ai.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.3,
+                max_tokens=300,
+                **extra
+            )
+            return response.choices[0].message.content.strip()
+        
+        elif provider == 'anthropic':
+            extra = {}
+            if schema:
+                # Forced tool call: the tool input is the structured query
+                extra['tools'] = [{"name": "query", "description": "Structured query", "input_schema": schema}]
+                extra['tool_choice'] = {"type": "tool", "name": "query"}
+            response = ai.client.messages.create(
+                model=ai.model,
+                max_tokens=300,
+                temperature=0.3,
+                system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+                messages=[{"role": "user", "content": user_prompt}],
+                **extra
+            )
+            if schema:
+                tool_use = next(block for block in response.content if block.type == 'tool_use')
+                return json.dumps(tool_use.input)
+            return response.content[0].text.strip()
+        
+        elif provider == 'gemini':
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            if schema:
+                response = ai.client.generate_content(
+                    full_prompt,
+                    generation_config={"response_mime_type": "application/json"}
+                )
+            else:
+                response = ai.client.generate_content(full_prompt)
+            return response.text.strip()
+        
+        elif provider == 'ollama':
+            payload = {
+                "model": ai.model,
+                "prompt": f"{system_prompt}\n\n{user_prompt}",
+                "stream": False
+            }
+            if schema:
+                payload["format"] = schema
+            response = self._http.post(f"{ai.client}/api/generate", json=payload, timeout=30)
+            if response.status_code == 200:
+                return response.json()['response'].strip()
+            raise Exception(f"Ollama error: {response.status_code}")
+        
+        raise Exception(f"Unsupported AI provider: {provider}")
+    
+    def _stream_ai(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Call AI provider with streaming, yielding text chunks"""
         provider = self.ai.provider
         
         if provider == 'openai':
-            response = self.ai.client.chat.completions.create(
+            stream = self.ai.client.chat.completions.create(
                 model=self.ai.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=300
+                max_tokens=300,
+                stream=True
             )
-            return response.choices[0].message.content.strip()
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         
         elif provider == 'anthropic':
-            response = self.ai.client.messages.create(
+            with self.ai.client.messages.stream(
                 model=self.ai.model,
                 max_tokens=300,
                 temperature=0.3,
                 system=system_prompt,
                 messages=[{"role": "user", "content": user_prompt}]
-            )
-            return response.content[0].text.strip()
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
         
         elif provider == 'gemini':
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            response = self.ai.client.generate_content(full_prompt)
-            return response.text.strip()
+            for chunk in self.ai.client.generate_content(full_prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
         
         elif provider == 'ollama':
-            import requests
-            response = requests.post(
+            with self._http.post(
                 f"{self.ai.client}/api/generate",
                 json={
                     "model": self.ai.model,
                     "prompt": f"{system_prompt}\n\n{user_prompt}",
-                    "stream": False
+                    "stream": True
                 },
+                stream=True,
                 timeout=30
-            )
-            if response.status_code == 200:
-                return response.json()['response'].strip()
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    part = json.loads(line)
+                    if part.get('response'):
+                        yield part['response']
+                    if part.get('done'):
+                        break
         
-        return "{}"
+        else:
+            yield self._call_ai(system_prompt, user_prompt)
     
-    def _execute_query(self, query: Dict) -> Any:
-        """Execute structured query on knowledge base"""
+    def _execute_query(self, query: Dict, kb_data=None) -> Any:
+        """
+        Execute structured query on knowledge base
+        
+        Args:
+            query: Structured query
+            kb_data: KB build to read (kb.current_data(), taken once per question)
+        """
+        if kb_data is None:
+            kb_data = self.kb.current_data()
         action = query.get('action')
         
         if action == 'rank':
-            return self._rank_services(query)
+            return self._rank_services(query, kb_data)
         elif action == 'filter':
-            return self._filter_services(query)
+            return self._filter_services(query, kb_data)
         elif action == 'aggregate':
-            return self._aggregate_stats(query)
+            return self._aggregate_stats(query, kb_data)
         elif action == 'compare':
-            return self._compare_services(query)
+            return self._compare_services(query, kb_data)
         elif action == 'count':
-            return self._count_services(query)
+            return self._count_services(query, kb_data)
         else:
-            return self._aggregate_stats({'scope': 'all'})
+            return self._aggregate_stats({'scope': 'all'}, kb_data)
     
-    def _rank_services(self, query: Dict) -> List[Dict]:
+    def _rank_services(self, query: Dict, kb_data) -> List[Dict]:
         """Rank services by metric"""
         metric = query.get('metric', 'health_score')
         order = query.get('order', 'desc')
         limit = query.get('limit', 5)
         
-        services = list(self.kb.get_all_services().values())
+        # "Top critical services by X": rank within a status
+        status = None
+        condition = query.get('condition')
+        if condition:
+            parsed = _parse_condition(condition)
+            if parsed is not None and parsed[1] == 'status':
+                status = parsed[2]
         
-        # Handle nested metrics
-        def get_metric_value(service):
-            if metric in ['error_count', 'response_time', 'failure_rate', 'request_count']:
-                return service['metrics'].get(metric, 0)
-            else:
-                return service.get(metric, 0)
+        ranked = self.kb.rank_by_metric(metric, order, limit, status=status, data=kb_data)
+        if ranked is not None:
+            return ranked
         
-        # Sort
-        sorted_services = sorted(
-            services,
-            key=get_metric_value,
-            reverse=(order == 'desc')
-        )
-        
-        return sorted_services[:limit]
+        # Metric not tracked by the KB columns - rank on whatever numeric values exist
+        services = [
+            s for s in kb_data.snapshot
+            if isinstance(s.get(metric), (int, float))
+            and (status is None or s['status'] == status)
+        ]
+        select = heapq.nlargest if order == 'desc' else heapq.nsmallest
+        return select(max(limit, 0), services, key=lambda s: s[metric])
     
-    def _filter_services(self, query: Dict) -> List[Dict]:
+    def _filter_services(self, query: Dict, kb_data) -> List[Dict]:
         """Filter services by condition"""
         condition = query.get('condition', '')
-        services = list(self.kb.get_all_services().values())
+        parsed = _parse_condition(condition)
+        if parsed is None:
+            logger.warning(f"Unsupported condition: {condition}")
+            return []
         
-        filtered = []
-        for service in services:
-            if self._evaluate_condition(service, condition):
-                filtered.append(service)
+        op, field, value = parsed
+        if op == '>' and field == 'problem_count' and value == 0:
+            return self.kb.services_with_problems(data=kb_data)
+        if op in ('>', '<'):
+            filtered = self.kb.filter_by_metric(field, op, value, data=kb_data)
+            if filtered is not None:
+                return filtered
+        elif field == 'status':
+            return self.kb.filter_by_status(value, data=kb_data)
         
-        return filtered
+        predicate = self._compile_condition(condition)
+        return [s for s in kb_data.snapshot if predicate(s)]
     
-    def _evaluate_condition(self, service: Dict, condition: str) -> bool:
-        """Evaluate condition against service"""
-        try:
-            # Simple condition parser
-            condition = condition.strip()
-            
-            # Handle status comparison
-            if "status ==" in condition:
-                match = re.search(r"status == ['\"](\w+)['\"]", condition)
-                if match:
-                    return service['status'] == match.group(1)
-            
-            # Handle numeric comparisons
-            if '>' in condition:
-                parts = condition.split('>')
-                metric = parts[0].strip()
-                threshold = float(parts[1].strip())
-                
-                if metric in ['error_count', 'response_time', 'failure_rate']:
-                    value = service['metrics'].get(metric, 0)
-                else:
-                    value = service.get(metric, 0)
-                
-                return isinstance(value, (int, float)) and value > threshold
-            
-            if '<' in condition:
-                parts = condition.split('<')
-                metric = parts[0].strip()
-                threshold = float(parts[1].strip())
-                
-                if metric in ['error_count', 'response_time', 'failure_rate']:
-                    value = service['metrics'].get(metric, 0)
-                else:
-                    value = service.get(metric, 0)
-                
-                return isinstance(value, (int, float)) and value < threshold
-            
-            return False
-            
-        except Exception as e:
-            logger.warning(f"Condition evaluation error: {e}")
-            return False
+    def _compile_condition(self, condition: str) -> Callable[[Dict], bool]:
+        """
+        Compile a condition string into a predicate over service records
+        
+        The condition is parsed once; the returned function only does the
+        field lookup and comparison per service.
+        """
+        parsed = _parse_condition(condition)
+        if parsed is None:
+            return lambda service: False
+        
+        op, field, value = parsed
+        if op == '==':
+            return lambda service: service.get(field) == value
+        
+        compare = operator.gt if op == '>' else operator.lt
+        
+        if field in _METRIC_UNDER_METRICS:
+            def predicate(service):
+                actual = service['metrics'].get(field)
+                return isinstance(actual, (int, float)) and compare(actual, value)
+        else:
+            def predicate(service):
+                actual = service.get(field)
+                return isinstance(actual, (int, float)) and compare(actual, value)
+        
+        return predicate
     
-    def _aggregate_stats(self, query: Dict) -> Dict:
+    def _aggregate_stats(self, query: Dict, kb_data) -> Dict:
         """Get aggregate statistics"""
-        return self.kb.get_stats()
+        return self.kb.get_stats(data=kb_data)
     
-    def _compare_services(self, query: Dict) -> List[Dict]:
+    def _compare_services(self, query: Dict, kb_data) -> List[Dict]:
         """Compare specific services"""
         service_names = query.get('services', [])
         services = []
         
         for name in service_names:
-            service = self.kb.get_service(name)
+            service = self.kb.get_service(name, data=kb_data)
             if service:
                 services.append(service)
         
         return services
     
-    def _count_services(self, query: Dict) -> Dict:
+    def _count_services(self, query: Dict, kb_data) -> Dict:
         """Count services"""
-        services = list(self.kb.get_all_services().values())
-        condition = query.get('condition')
-        
-        if condition:
-            services = [s for s in services if self._evaluate_condition(s, condition)]
+        if query.get('condition'):
+            services = self._filter_services(query, kb_data)
+        else:
+            services = list(kb_data.snapshot)
         
         return {
             'count': len(services),
@@ -362,26 +886,15 @@ Convert the question to query JSON:"""
     
     def _generate_answer(self, question: str, query: Dict, data: Any) -> str:
         """Generate natural language answer using AI"""
-        action = query.get('action')
-        
-        # Build context for AI
-        if action == 'rank':
-            context = self._build_ranking_context(data)
-        elif action == 'filter':
-            context = self._build_filter_context(data)
-        elif action == 'aggregate':
-            context = self._build_aggregate_context(data)
-        elif action == 'compare':
-            context = self._build_compare_context(data)
-        elif action == 'count':
-            context = self._build_count_context(data)
-        else:
-            context = str(data)
+        # Nothing for the AI to add to an empty result
+        if self._is_trivial(query.get('action'), data):
+            return self._generate_template_answer(question, query, data)
         
         # Generate answer with AI
         if self.ai.provider != 'fallback':
             try:
-                answer = self._generate_ai_answer(question, context, action)
+                context = self._build_answer_context(query, data)
+                answer = self._generate_ai_answer(question, context, query.get('action'))
                 return answer
             except Exception as e:
                 logger.warning(f"AI answer generation failed: {e}")
@@ -389,25 +902,46 @@ Convert the question to query JSON:"""
         # Fallback to template
         return self._generate_template_answer(question, query, data)
     
+    def _is_trivial(self, action: str, data: Any) -> bool:
+        """True for empty results that the template answers just as well"""
+        if action in ('filter', 'rank', 'compare'):
+            return not data
+        if action == 'count' and isinstance(data, dict):
+            return data.get('count', 0) == 0
+        return False
+    
+    def _build_answer_context(self, query: Dict, data: Any) -> str:
+        """Build the data context the AI answers from"""
+        action = query.get('action')
+        
+        if action == 'rank':
+            return self._build_ranking_context(data)
+        elif action == 'filter':
+            return self._build_filter_context(data)
+        elif action == 'aggregate':
+            return self._build_aggregate_context(data)
+        elif action == 'compare':
+            return self._build_compare_context(data)
+        elif action == 'count':
+            return self._build_count_context(data)
+        else:
+            return str(data)
+    
     def _build_ranking_context(self, services: List[Dict]) -> str:
         """Build context for ranking results"""
         lines = []
         for i, svc in enumerate(services[:10], 1):
-            name = svc['display_name']
-            health = svc['health_score']
-            status = svc['status']
-            problems = svc['problem_count']
-            
             metrics = svc['metrics']
-            error_count = metrics.get('error_count', 'N/A')
-            response_time = metrics.get('response_time', 'N/A')
-            failure_rate = metrics.get('failure_rate', 'N/A')
-            
-            lines.append(
-                f"{i}. {name}: health={health}, status={status}, "
-                f"errors={error_count}, response={response_time}ms, "
-                f"failure={failure_rate}%, problems={problems}"
-            )
+            lines.append(RANK_FMT.format(
+                i=i,
+                name=svc['display_name'],
+                health=svc['health_score'],
+                status=svc['status'],
+                ec=metrics.get('error_count', 'N/A'),
+                rt=metrics.get('response_time', 'N/A'),
+                fr=metrics.get('failure_rate', 'N/A'),
+                pc=svc['problem_count']
+            ))
         
         return "\n".join(lines)
     
@@ -449,11 +983,11 @@ Average response time: {stats.get('avg_response_time', 0)}ms
     
     def _generate_ai_answer(self, question: str, context: str, action: str) -> str:
         """Generate answer using AI"""
-        
-        system_prompt = """You are a friendly Dynatrace monitoring assistant.
-Generate natural, conversational answers based on the data provided.
-Be concise but informative. Use emojis sparingly for emphasis."""
-        
+        system_prompt, user_prompt = self._answer_prompts(question, context)
+        return self._call_ai(system_prompt, user_prompt)
+    
+    def _answer_prompts(self, question: str, context: str) -> tuple:
+        """Build (system_prompt, user_prompt) for answer generation"""
         user_prompt = f"""Question: "{question}"
 
 Data:
@@ -463,7 +997,7 @@ Generate a natural, helpful answer. If there are critical issues, mention them f
 If comparing services, highlight key differences.
 Keep it conversational and friendly."""
         
-        return self._call_ai(system_prompt, user_prompt)
+        return ANSWER_SYSTEM_PROMPT, user_prompt
     
     def _generate_template_answer(self, question: str, query: Dict, data: Any) -> str:
         """Generate template-based answer as fallback"""
@@ -474,18 +1008,19 @@ Keep it conversational and friendly."""
                 return "No services found matching that criteria."
             
             metric = query.get('metric', 'health_score')
-            lines = [f"Here are the top {len(data)} services by {metric.replace('_', ' ')}:\n"]
+            label = _metric_label(metric)
+            lines = [f"Here are the top {len(data)} services by {label}:\n"]
             
             for i, svc in enumerate(data, 1):
                 name = svc['display_name']
-                status_emoji = "🟢" if svc['status'] == 'healthy' else "⚠️" if svc['status'] == 'warning' else "🔴"
+                status_emoji = _EMOJI_GET(svc['status'], '🔴')
                 
                 if metric in svc['metrics']:
                     value = svc['metrics'][metric]
                 else:
                     value = svc.get(metric, 'N/A')
                 
-                lines.append(f"{i}. {status_emoji} **{name}** - {metric.replace('_', ' ')}: {value}")
+                lines.append(f"{i}. {status_emoji} **{name}** - {label}: {value}")
             
             return "\n".join(lines)
         
@@ -514,7 +1049,7 @@ Keep it conversational and friendly."""
             
             lines = [f"Found **{len(data)}** services:\n"]
             for svc in data[:10]:
-                status_emoji = "🟢" if svc['status'] == 'healthy' else "⚠️" if svc['status'] == 'warning' else "🔴"
+                status_emoji = _EMOJI_GET(svc['status'], '🔴')
                 lines.append(f"• {status_emoji} {svc['display_name']} ({svc['status']})")
             
             if len(data) > 10:
@@ -522,4 +1057,10 @@ Keep it conversational and friendly."""
             
             return "\n".join(lines)
         
+        elif action == 'compare' and not data:
+            return "I couldn't find those services. Check the service names and try again."
+        
+        elif action == 'count' and isinstance(data, dict) and data.get('count', 0) == 0:
+            return "No services match that criteria."
+        
         return str(data)
@@ -25,6 +25,25 @@ class Config:
         self.MAX_CHAT_HISTORY = int(os.getenv("MAX_CHAT_HISTORY", "50"))
         self.DEFAULT_TIMEFRAME = os.getenv("DEFAULT_TIMEFRAME", "2h")
         
+        # Cache Configuration
+        self.ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+        self.ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "300"))  # seconds
+        self.PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", "86400"))  # seconds
+        self.ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "600"))  # seconds
+        self.SERVICE_DATA_CACHE_TTL = int(os.getenv("SERVICE_DATA_CACHE_TTL", "60"))  # seconds
+        self.PREWARM_TOP_SERVICES = int(os.getenv("PREWARM_TOP_SERVICES", "5"))
+        self.KB_CACHE_PATH = os.getenv(
+            "KB_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "dt_bot", "kb.pkl")
+        )
+        self.KB_CACHE_TTL = int(os.getenv("KB_CACHE_TTL", "600"))  # seconds, 0 disables the disk cache
+        # How long rebuilds may reuse fetched sub-results (seconds)
+        self.KB_SERVICES_TTL = int(os.getenv("KB_SERVICES_TTL", "1800"))
+        self.KB_METRICS_TTL = int(os.getenv("KB_METRICS_TTL", "120"))
+        self.KB_PROBLEMS_TTL = int(os.getenv("KB_PROBLEMS_TTL", "30"))
+        # Pacing for KB build requests to Dynatrace (token bucket)
+        self.DT_API_RATE_LIMIT = float(os.getenv("DT_API_RATE_LIMIT", "5"))  # requests/second
+        self.DT_API_BURST = int(os.getenv("DT_API_BURST", "10"))
+        
         # Validate required configs
         self._validate_dynatrace_config()
         self._validate_ai_config()
@@ -49,6 +68,15 @@ class Config:
         self.OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
         self.OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
         
+        # Max concurrent AI requests (stay within provider rate limits)
+        self.AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+        
+        # Seconds before a slow AI call is hedged to a backup provider (until latency history exists)
+        self.AI_HEDGE_DEFAULT_DELAY = float(os.getenv("AI_HEDGE_DEFAULT_DELAY", "3"))
+        
+        # Seconds between Ollama model warm-ups (0 disables; keep under Ollama's 5 min keep-alive)
+        self.AI_PREFIX_WARM_INTERVAL = int(os.getenv("AI_PREFIX_WARM_INTERVAL", "0"))
+        
         # AI Provider Selection (auto-detect if not specified)
         self.AI_PROVIDER = os.getenv("AI_PROVIDER", "auto")  # auto, openai, anthropic, gemini, ollama, fallback
     
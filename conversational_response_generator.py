@@ -2,45 +2,270 @@
 Enhanced AI Response Generator with Conversational Personality
 Makes responses feel natural, warm, and human-like
 """
-import random
-from typing import Dict, List
+import heapq
+from itertools import islice, product
+import sys
+from random import random as _random
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from config.settings import config
+from utils.cache import TTLCache
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Status / relevance values compared on every analysis. Interned so ==
+# takes the identity fast path against the (also interned) literals the
+# metrics and problems APIs return.
+HEALTHY = sys.intern("healthy")
+WARNING = sys.intern("warning")
+CRITICAL = sys.intern("critical")
+UNKNOWN = sys.intern("unknown")
+ROOT_CAUSE = sys.intern("root_cause")
+
+def _choice(seq):
+    """Pick a phrase variant (one C-level random() call, no _randbelow loop)"""
+    return seq[int(_random() * len(seq))]
+
+_EMPTY = {}  # shared default for missing nested dicts (never mutated)
+
+def _num(metrics: Dict, key: str):
+    """Get a numeric metric value, or None when missing/'N/A'"""
+    value = metrics.get(key)
+    return value if type(value) is int or type(value) is float else None
+
+_UNDERSCORE_TABLE = str.maketrans("_", " ")
+
+@lru_cache(maxsize=64)
+def _format_metric_key(key: str) -> str:
+    """'error_count' -> 'Error Count' (metric keys repeat, so this is cached)"""
+    return key.translate(_UNDERSCORE_TABLE).title()
+
+class _MetricsView(NamedTuple):
+    """Numeric metric values (None when missing/'N/A')"""
+    error_count: Optional[float]
+    response_time: Optional[float]
+    failure_rate: Optional[float]
+
+def _view(metrics: Dict) -> _MetricsView:
+    """Normalize the metrics the responses use in one pass"""
+    return _MetricsView(
+        _num(metrics, "error_count"),
+        _num(metrics, "response_time"),
+        _num(metrics, "failure_rate"),
+    )
+
+# Next-step suggestions, checked in order
+_ISSUE_STATUSES = frozenset({CRITICAL, WARNING})
+_PROBLEM_STEPS = (
+    "• Look into when these problems started?",
+    "• Check if other services are affected?",
+)
+_METRIC_STEP_RULES = (  # (metric, suggest when above, suggestion)
+    ("failure_rate", 2, "• Review error logs for patterns?"),
+    ("response_time", 800, "• Check database or downstream services?"),
+)
+_HEALTHY_STEPS = (
+    "• Compare with yesterday's performance?",
+    "• Check other services?",
+    "• Set up monitoring for changes?",
+)
+_LONGER_TIMEFRAME_STEP = "• See metrics over a longer timeframe?"
+
+def _issue_suggestions(has_problems: bool, *metric_hits: bool) -> str:
+    """Join the issue suggestions for one combination of triggers"""
+    steps = list(_PROBLEM_STEPS) if has_problems else []
+    steps.extend(text for hit, (_, _, text) in zip(metric_hits, _METRIC_STEP_RULES) if hit)
+    steps.append(_LONGER_TIMEFRAME_STEP)
+    return "\n".join(steps)
+
+# Every (has_problems, *metric rule hit) combination, joined once at import
+_ISSUE_SUGGESTIONS = {
+    combo: _issue_suggestions(*combo)
+    for combo in product((False, True), repeat=1 + len(_METRIC_STEP_RULES))
+}
+_HEALTHY_SUGGESTIONS = "\n".join(_HEALTHY_STEPS)
+
+class ServiceProjection(tuple):
+    """(service_type, display_name) pairs derived once from a services list"""
+
+def project_services(services: List[Dict]) -> ServiceProjection:
+    """
+    Project service entities to (service_type, display_name) pairs
+    
+    Callers rendering the same list repeatedly (e.g. paging) can project once
+    and pass the result to generate_service_list_response.
+    """
+    return ServiceProjection(
+        (
+            (service.get("properties") or _EMPTY).get("serviceType", "Unknown"),
+            service.get("displayName") or service.get("entityId") or "Unknown",
+        )
+        for service in services
+    )
+
+class ConversationContext(NamedTuple):
+    """Conversation state used to personalize responses"""
+    is_followup: bool = False
+    frequently_checked: bool = False
+    recent_services: tuple = ()
+
+_NO_CONTEXT = ConversationContext()
+
+def _as_context(context: Union[ConversationContext, Dict, None]) -> ConversationContext:
+    """Wrap a legacy context dict (or None) in a ConversationContext"""
+    if context is None:
+        return _NO_CONTEXT
+    if isinstance(context, ConversationContext):
+        return context
+    return ConversationContext(
+        is_followup=bool(context.get("is_followup")),
+        frequently_checked=bool(context.get("frequently_checked")),
+        recent_services=tuple(context.get("recent_services") or ()),
+    )
+
 class ConversationalResponseGenerator:
     """Generate natural, conversational responses with personality"""
     
     def __init__(self, ai_client):
         self.ai_client = ai_client
         self.provider = ai_client.provider if ai_client else 'fallback'
+        
+        # Deterministic analysis parts (body + suggestions) keyed by everything
+        # that ends up in them; the varied phrasing is picked fresh per call
+        self._response_cache = TTLCache(maxsize=256, ttl=config.ANSWER_CACHE_TTL)
     
     # Conversational openers (varied responses)
-    ANALYSIS_OPENERS = [
+    # Plain format strings, filled in with .format() only for the chosen variant
+    ANALYSIS_OPENERS = (
         "Let me take a look at {service} for you...",
         "Checking {service} now...",
         "Alright, diving into {service}...",
         "On it! Looking at {service}...",
         "Sure thing! Let me check {service}...",
-    ]
+    )
+    
+    FOLLOWUP_OPENERS = (
+        "Sure, looking at {service} again...",
+        "Okay, checking {service} with the new timeframe...",
+        "Got it, let me refresh the data for {service}...",
+    )
+    
+    FREQUENT_OPENERS = (
+        "Checking {service} again - you've been keeping a close eye on this one!",
+        "Back to {service} - let's see how it's doing now...",
+        "{service} check coming up - this one's on your radar today!",
+    )
+    
+    HEALTHY_OPENERS = (
+        "Great news! {service} is running smoothly.",
+        "Looking good! {service} is healthy.",
+        "All clear with {service}!",
+        "{service} is doing well!",
+    )
+    
+    WARNING_OPENERS = (
+        "I found something worth noting with {service}.",
+        "{service} has some issues that need attention.",
+        "Okay, I see a few concerns with {service}.",
+        "{service} is mostly okay, but I spotted some issues.",
+    )
+    
+    CRITICAL_OPENERS = (
+        "⚠️ We have a situation with {service}.",
+        "🚨 {service} needs immediate attention.",
+        "This is concerning - {service} has critical issues.",
+        "Not good news on {service} - found some serious problems.",
+    )
+    
+    NEXT_STEPS_INTROS = (
+        "**Want me to:**",
+        "**What would you like to do next?**",
+        "**I can help with:**",
+        "**Next steps:**",
+    )
+    
+    SERVICE_LIST_OPENERS = (
+        "I found **{count} services** in your environment:",
+        "You've got **{count} services** here:",
+        "Here's what I found - **{count} services** total:",
+        "Okay! I see **{count} services**:",
+    )
+    
+    SERVICE_LIST_CLOSINGS = (
+        "Which one would you like me to check?",
+        "Want me to analyze any of these?",
+        "I can check any of these for you - just say the word!",
+        "Need details on any particular service?",
+    )
+    
+    CLARIFICATION_OPENERS = (
+        "Which service would you like me to check?",
+        "I'd be happy to help! Which service should I look at?",
+        "Sure thing! Which service are you interested in?",
+        "Got it! What service should I analyze?",
+    )
+    
+    API_ERROR_MESSAGES = (
+        "Oops! I'm having trouble connecting to Dynatrace. Can you try again in a moment?",
+        "Hmm, Dynatrace isn't responding. Mind trying that again?",
+        "Something went wrong on my end. Want to give it another shot?",
+    )
+    
+    HELP_INTROS = (
+        "I'm here to help! Here's what I can do:",
+        "Happy to help! I can assist with:",
+        "Sure thing! Here are my capabilities:",
+        "No problem! I can help you with:",
+    )
+    
+    # Everything after the intro - identical on every help request
+    HELP_BODY = """
+
+**🔍 Check Service Health**
+• "How is ordercontroller doing?"
+• "Check payment-api"
+• "Any issues with checkout-service?"
+
+**📋 List Services**
+• "Show me all services"
+• "What services do I have?"
+
+**📊 Analyze Metrics**
+• "What's the performance of auth-service?"
+• "Show me metrics for the last 4 hours"
+
+**🔧 Troubleshoot**
+• "Why is inventory-api slow?"
+• "What's wrong with my services?"
+
+**💡 Tip:** Just talk naturally - I understand conversational queries!
+
+What would you like to know?"""
+    
+    SERVICE_NOT_FOUND_MESSAGE = "I couldn't find that service. Could you double-check the name, or type 'show all' to see what's available?"
+    AMBIGUOUS_QUERY_MESSAGE = "I'm not quite sure what you're asking. Could you be a bit more specific? Or type 'help' to see what I can do!"
+    UNCLEAR_MESSAGE = "I'm not sure I understood that. Could you rephrase?"
+    NO_DATA_MESSAGE = "I couldn't find any data for that timeframe. Try a different time period?"
+    DEFAULT_ERROR_MESSAGE = "Oops! Something went wrong. Mind trying again?"
     
-    ACKNOWLEDGMENTS = [
+    ACKNOWLEDGMENTS = (
         "Got it!",
         "Sure thing!",
         "Absolutely!",
         "On it!",
         "You bet!",
         "No problem!",
-    ]
+    )
     
-    THINKING_PHRASES = [
+    THINKING_PHRASES = (
         "Let me see...",
         "Hmm, interesting...",
         "Okay, so...",
         "Alright...",
         "Looking at this...",
-    ]
+    )
     
     def generate_service_analysis(
         self,
@@ -49,7 +274,7 @@ class ConversationalResponseGenerator:
         problems: List[Dict],
         insights: Dict,
         timeframe: str,
-        context: Dict = None
+        context: Optional[ConversationContext] = None
     ) -> str:
         """
         Generate natural, conversational analysis
@@ -60,8 +285,24 @@ class ConversationalResponseGenerator:
             problems: Problems list
             insights: Analysis insights
             timeframe: Time period
-            context: Conversation context (for personalization)
+            context: Conversation context (for personalization; dicts are still accepted)
         """
+        context = _as_context(context)
+        
+        cache_key = self._response_cache_key(
+            service_name, metrics, problems, insights, timeframe
+        )
+        cached = self._response_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            status_openers, body, suggestions = cached
+        else:
+            status_openers, body = self._generate_natural_analysis(
+                service_name, metrics, problems, insights, timeframe
+            )
+            suggestions = self._next_step_suggestions(metrics, problems, insights)
+            if cache_key is not None:
+                self._response_cache.set(cache_key, (status_openers, body, suggestions))
+        
         # Build conversational response
         response_parts = []
         
@@ -71,40 +312,58 @@ class ConversationalResponseGenerator:
             response_parts.append(opening)
         
         # 2. Main analysis with personality
-        analysis = self._generate_natural_analysis(
-            service_name, metrics, problems, insights, timeframe
-        )
-        response_parts.append(analysis)
+        if status_openers:
+            body = _choice(status_openers).format(service=service_name) + body
+        response_parts.append(body)
         
         # 3. Proactive next steps
-        next_steps = self._suggest_next_steps(
-            service_name, metrics, problems, insights, context
-        )
-        if next_steps:
-            response_parts.append("\n" + next_steps)
+        if suggestions:
+            response_parts.append("\n" + _choice(self.NEXT_STEPS_INTROS) + "\n" + suggestions)
         
         return "\n\n".join(response_parts)
     
-    def _generate_opening(self, service_name: str, context: Dict = None) -> str:
+    def _response_cache_key(
+        self,
+        service_name: str,
+        metrics: Dict,
+        problems: List[Dict],
+        insights: Dict,
+        timeframe: str
+    ) -> Optional[tuple]:
+        """
+        Build an exact cache key for an analysis
+        
+        Covers every input the cached body shows (metric values, first three
+        problems and concerns). Returns None if the inputs aren't hashable.
+        """
+        key = (
+            service_name,
+            insights.get("status", UNKNOWN),
+            tuple(metrics.items()),
+            len(problems),
+            tuple((p.get("title"), p.get("relevance")) for p in islice(problems, 3)),
+            tuple(islice(insights.get("concerns", ()), 3)),
+            timeframe,
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    
+    def _generate_opening(self, service_name: str, context: ConversationContext = _NO_CONTEXT) -> str:
         """Generate conversational opening"""
-        # Check if this is a follow-up
-        if context and context.get("is_followup"):
-            return random.choice([
-                f"Sure, looking at {service_name} again...",
-                f"Okay, checking {service_name} with the new timeframe...",
-                f"Got it, let me refresh the data for {service_name}...",
-            ])
-        
-        # Check if user frequently checks this service
-        if context and context.get("frequently_checked"):
-            return random.choice([
-                f"Checking {service_name} again - you've been keeping a close eye on this one!",
-                f"Back to {service_name} - let's see how it's doing now...",
-                f"{service_name} check coming up - this one's on your radar today!",
-            ])
-        
-        # Standard opening
-        return random.choice(self.ANALYSIS_OPENERS).format(service=service_name)
+        if context.is_followup:
+            # Follow-up on the same service
+            templates = self.FOLLOWUP_OPENERS
+        elif context.frequently_checked:
+            # User frequently checks this service
+            templates = self.FREQUENT_OPENERS
+        else:
+            templates = self.ANALYSIS_OPENERS
+        
+        # Only the chosen template is ever formatted
+        return _choice(templates).format_map({'service': service_name})
     
     def _generate_natural_analysis(
         self,
@@ -113,45 +372,40 @@ class ConversationalResponseGenerator:
         problems: List[Dict],
         insights: Dict,
         timeframe: str
-    ) -> str:
-        """Generate natural language analysis"""
-        status = insights.get("status", "unknown")
+    ) -> Tuple[Tuple[str, ...], str]:
+        """
+        Generate natural language analysis
+        
+        Returns (status opener variants, body): the caller picks and prepends
+        the opener, so the body can be cached without freezing its phrasing.
+        """
+        status = insights.get("status", UNKNOWN)
         concerns = insights.get("concerns", [])
         
         # Start with status-appropriate opening
-        if status == "healthy" and not problems:
-            return self._generate_healthy_response(service_name, metrics, timeframe)
-        elif status == "warning":
-            return self._generate_warning_response(service_name, metrics, problems, concerns, timeframe)
-        elif status == "critical":
-            return self._generate_critical_response(service_name, metrics, problems, concerns, timeframe)
+        if status == HEALTHY and not problems:
+            return self.HEALTHY_OPENERS, self._generate_healthy_response(metrics, timeframe)
+        elif status == WARNING:
+            return self.WARNING_OPENERS, self._generate_warning_response(metrics, problems, concerns, timeframe)
+        elif status == CRITICAL:
+            return self.CRITICAL_OPENERS, self._generate_critical_response(metrics, problems, timeframe)
         else:
-            return self._generate_unknown_response(service_name, metrics, timeframe)
+            return (), self._generate_unknown_response(service_name, metrics, timeframe)
     
-    def _generate_healthy_response(self, service_name: str, metrics: Dict, timeframe: str) -> str:
-        """Generate response for healthy service"""
-        openers = [
-            f"Great news! {service_name} is running smoothly.",
-            f"Looking good! {service_name} is healthy.",
-            f"All clear with {service_name}!",
-            f"{service_name} is doing well!",
-        ]
-        
-        error_count = metrics.get("error_count", "N/A")
-        response_time = metrics.get("response_time", "N/A")
+    def _generate_healthy_response(self, metrics: Dict, timeframe: str) -> str:
+        """Generate response for healthy service (text after the HEALTHY_OPENERS variant)"""
+        error_count, response_time, _ = _view(metrics)
         
         details = []
-        if isinstance(error_count, int) and error_count < 10:
+        if error_count is not None and error_count < 10:
             details.append(f"minimal errors ({error_count})")
-        if isinstance(response_time, (int, float)) and response_time < 500:
+        if response_time is not None and response_time < 500:
             details.append(f"good response times ({response_time}ms)")
         
-        response = random.choice(openers)
-        
         if details:
-            response += f" Over the {timeframe}, I'm seeing {' and '.join(details)}."
+            response = f" Over the {timeframe}, I'm seeing {' and '.join(details)}."
         else:
-            response += f" No issues detected over the {timeframe}."
+            response = f" No issues detected over the {timeframe}."
         
         response += " Everything looks solid! 🎉"
         
@@ -159,212 +413,165 @@ class ConversationalResponseGenerator:
     
     def _generate_warning_response(
         self, 
-        service_name: str, 
         metrics: Dict, 
         problems: List[Dict],
         concerns: List[str],
         timeframe: str
     ) -> str:
-        """Generate response for service with warnings"""
-        openers = [
-            f"I found something worth noting with {service_name}.",
-            f"{service_name} has some issues that need attention.",
-            f"Okay, I see a few concerns with {service_name}.",
-            f"{service_name} is mostly okay, but I spotted some issues.",
-        ]
-        
-        response = random.choice(openers)
-        response += f" Over the {timeframe}:\n\n"
+        """Generate response for service with warnings (text after the WARNING_OPENERS variant)"""
+        parts = [f" Over the {timeframe}:\n\n"]
         
         # Add metrics with context
-        error_count = metrics.get("error_count", "N/A")
-        response_time = metrics.get("response_time", "N/A")
-        failure_rate = metrics.get("failure_rate", "N/A")
+        error_count, response_time, failure_rate = _view(metrics)
         
-        if isinstance(error_count, int):
-            response += f"• **{error_count} errors** recorded"
+        if error_count is not None:
+            parts.append(f"• **{error_count} errors** recorded")
             if error_count > 100:
-                response += " (that's quite a bit)"
-            response += "\n"
+                parts.append(" (that's quite a bit)")
+            parts.append("\n")
         
-        if isinstance(response_time, (int, float)):
-            response += f"• **Response time at {response_time}ms**"
+        if response_time is not None:
+            parts.append(f"• **Response time at {response_time}ms**")
             if response_time > 500:
-                response += " (slower than ideal)"
-            response += "\n"
+                parts.append(" (slower than ideal)")
+            parts.append("\n")
         
-        if isinstance(failure_rate, (int, float)):
-            response += f"• **Failure rate: {failure_rate}%**"
+        if failure_rate is not None:
+            parts.append(f"• **Failure rate: {failure_rate}%**")
             if failure_rate > 1:
-                response += " (higher than normal)"
-            response += "\n"
+                parts.append(" (higher than normal)")
+            parts.append("\n")
         
         # Add problems if any
         if problems:
-            response += f"\n**{len(problems)} open problem(s):**\n"
-            for i, problem in enumerate(problems[:3], 1):
-                response += f"{i}. {problem.get('title', 'Unknown issue')}\n"
+            parts.append(f"\n**{len(problems)} open problem(s):**\n")
+            for i, problem in enumerate(islice(problems, 3), 1):
+                parts.append(f"{i}. {problem.get('title', 'Unknown issue')}\n")
         
         # Add concerns
         if concerns:
-            response += "\n**What caught my attention:**\n"
-            for concern in concerns[:3]:
-                response += f"• {concern}\n"
-        
-        return response.strip()
+            parts.append("\n**What caught my attention:**\n")
+            for concern in islice(concerns, 3):
+                parts.append(f"• {concern}\n")
+        
+        # Every segment group ends in a newline; trim it off the last one
+        # instead of strip()-copying the whole response
+        parts[-1] = parts[-1].rstrip("\n")
+        return "".join(parts)
     
     def _generate_critical_response(
         self,
-        service_name: str,
         metrics: Dict,
         problems: List[Dict],
-        concerns: List[str],
         timeframe: str
     ) -> str:
-        """Generate response for critical service issues"""
-        openers = [
-            f"⚠️ We have a situation with {service_name}.",
-            f"🚨 {service_name} needs immediate attention.",
-            f"This is concerning - {service_name} has critical issues.",
-            f"Not good news on {service_name} - found some serious problems.",
-        ]
-        
-        response = random.choice(openers)
-        response += f" Here's what I'm seeing over the {timeframe}:\n\n"
+        """Generate response for critical service issues (text after the CRITICAL_OPENERS variant)"""
+        parts = [f" Here's what I'm seeing over the {timeframe}:\n\n"]
         
         # Highlight critical metrics
-        error_count = metrics.get("error_count", "N/A")
-        response_time = metrics.get("response_time", "N/A")
-        failure_rate = metrics.get("failure_rate", "N/A")
+        error_count, response_time, failure_rate = _view(metrics)
         
-        if isinstance(failure_rate, (int, float)) and failure_rate > 5:
-            response += f"🔴 **Failure rate is at {failure_rate}%** - that's critical!\n"
+        if failure_rate is not None and failure_rate > 5:
+            parts.append(f"🔴 **Failure rate is at {failure_rate}%** - that's critical!\n")
         
-        if isinstance(error_count, int) and error_count > 100:
-            response += f"🔴 **{error_count} errors** - significantly elevated\n"
+        if error_count is not None and error_count > 100:
+            parts.append(f"🔴 **{error_count} errors** - significantly elevated\n")
         
-        if isinstance(response_time, (int, float)) and response_time > 1000:
-            response += f"🔴 **Response time spiked to {response_time}ms** - extremely slow\n"
+        if response_time is not None and response_time > 1000:
+            parts.append(f"🔴 **Response time spiked to {response_time}ms** - extremely slow\n")
         
         # Critical problems
         if problems:
-            response += f"\n**🚨 {len(problems)} Critical Problem(s):**\n"
-            for i, problem in enumerate(problems[:3], 1):
+            parts.append(f"\n**🚨 {len(problems)} Critical Problem(s):**\n")
+            for i, problem in enumerate(islice(problems, 3), 1):
                 relevance = problem.get("relevance", "")
-                icon = "🔴" if relevance == "root_cause" else "⚠️"
-                response += f"{icon} {problem.get('title', 'Unknown')}\n"
+                icon = "🔴" if relevance == ROOT_CAUSE else "⚠️"
+                parts.append(f"{icon} {problem.get('title', 'Unknown')}\n")
         
         # What to do
-        response += "\n**This needs urgent attention.** "
+        parts.append("\n**This needs urgent attention.** ")
         
-        return response
+        return "".join(parts)
     
     def _generate_unknown_response(self, service_name: str, metrics: Dict, timeframe: str) -> str:
         """Generate response when status is unclear"""
-        response = f"I checked {service_name} over the {timeframe}. Here's what I found:\n\n"
-        
-        for key, value in metrics.items():
-            formatted_key = key.replace("_", " ").title()
-            response += f"• {formatted_key}: {value}\n"
-        
-        response += "\nThe metrics are a bit mixed - not clearly healthy or problematic."
+        body = "".join([
+            f"• {_format_metric_key(key)}: {value}\n" for key, value in metrics.items()
+        ])
         
-        return response
+        return (
+            f"I checked {service_name} over the {timeframe}. Here's what I found:\n\n"
+            f"{body}\nThe metrics are a bit mixed - not clearly healthy or problematic."
+        )
     
-    def _suggest_next_steps(
+    def _next_step_suggestions(
         self,
-        service_name: str,
         metrics: Dict,
         problems: List[Dict],
-        insights: Dict,
-        context: Dict = None
+        insights: Dict
     ) -> str:
-        """Suggest proactive next steps"""
-        status = insights.get("status", "unknown")
-        suggestions = []
+        """Suggest proactive next steps (the lines under a NEXT_STEPS_INTROS variant)"""
+        status = insights.get("status", UNKNOWN)
         
-        if status == "critical" or status == "warning":
+        if status in _ISSUE_STATUSES:
             # Suggest investigation steps
-            if problems:
-                suggestions.append("• Look into when these problems started?")
-                suggestions.append("• Check if other services are affected?")
-            
-            failure_rate = metrics.get("failure_rate", 0)
-            if isinstance(failure_rate, (int, float)) and failure_rate > 2:
-                suggestions.append("• Review error logs for patterns?")
-            
-            response_time = metrics.get("response_time", 0)
-            if isinstance(response_time, (int, float)) and response_time > 800:
-                suggestions.append("• Check database or downstream services?")
-            
-            suggestions.append("• See metrics over a longer timeframe?")
-        
-        elif status == "healthy":
+            combo = (bool(problems),) + tuple(
+                (value := _num(metrics, key)) is not None and value > threshold
+                for key, threshold, _ in _METRIC_STEP_RULES
+            )
+            suggestions = _ISSUE_SUGGESTIONS[combo]
+        elif status == HEALTHY:
             # Suggest monitoring or comparison
-            suggestions.append("• Compare with yesterday's performance?")
-            suggestions.append("• Check other services?")
-            suggestions.append("• Set up monitoring for changes?")
+            suggestions = _HEALTHY_SUGGESTIONS
+        else:
+            return ""
         
-        if suggestions:
-            intro = random.choice([
-                "**Want me to:**",
-                "**What would you like to do next?**",
-                "**I can help with:**",
-                "**Next steps:**",
-            ])
-            return intro + "\n" + "\n".join(suggestions)
-        
-        return ""
+        return suggestions
     
     def generate_service_list_response(
         self, 
-        services: List[Dict],
+        services: Union[List[Dict], ServiceProjection],
         context: Dict = None
     ) -> str:
-        """Generate natural service list response"""
+        """
+        Generate natural service list response
+        
+        Args:
+            services: Service entities, or their project_services() projection
+            context: Conversation context (unused)
+        """
         if not services:
             return "Hmm, I couldn't find any services. That's odd - want me to try again?"
         
+        if not isinstance(services, ServiceProjection):
+            services = project_services(services)
+        
         # Group by type
-        services_by_type = {}
-        for service in services:
-            service_type = service.get("properties", {}).get("serviceType", "Unknown")
-            if service_type not in services_by_type:
-                services_by_type[service_type] = []
-            services_by_type[service_type].append(
-                service.get("displayName", service.get("entityId", "Unknown"))
-            )
+        services_by_type = defaultdict(list)
+        for service_type, name in services:
+            services_by_type[service_type].append(name)
         
         # Natural opening
-        opener = random.choice([
-            f"I found **{len(services)} services** in your environment:",
-            f"You've got **{len(services)} services** here:",
-            f"Here's what I found - **{len(services)} services** total:",
-            f"Okay! I see **{len(services)} services**:",
-        ])
+        opener = _choice(self.SERVICE_LIST_OPENERS).format(count=len(services))
         
-        response = opener + "\n\n"
+        parts = [opener, "\n\n"]
         
         # List by type
         for service_type, names in sorted(services_by_type.items()):
-            response += f"**{service_type}** ({len(names)}):\n"
-            for name in sorted(names[:10]):
-                response += f"• {name}\n"
+            parts.append(f"**{service_type}** ({len(names)}):\n")
+            # First 10 names alphabetically, without sorting the whole group
+            for name in heapq.nsmallest(10, names):
+                parts.append(f"• {name}\n")
             if len(names) > 10:
-                response += f"  _...and {len(names) - 10} more_\n"
-            response += "\n"
+                parts.append(f"  _...and {len(names) - 10} more_\n")
+            parts.append("\n")
         
         # Friendly closing
-        closing = random.choice([
-            "Which one would you like me to check?",
-            "Want me to analyze any of these?",
-            "I can check any of these for you - just say the word!",
-            "Need details on any particular service?",
-        ])
+        closing = _choice(self.SERVICE_LIST_CLOSINGS)
         
-        response += f"💡 {closing}"
+        parts.append(f"💡 {closing}")
         
-        return response
+        return "".join(parts)
     
     def generate_clarification_request(
         self,
@@ -375,80 +582,41 @@ class ConversationalResponseGenerator:
         """Generate natural clarification question"""
         
         if issue == "no_service_name":
-            openers = [
-                "Which service would you like me to check?",
-                "I'd be happy to help! Which service should I look at?",
-                "Sure thing! Which service are you interested in?",
-                "Got it! What service should I analyze?",
-            ]
-            
-            response = random.choice(openers)
+            parts = [_choice(self.CLARIFICATION_OPENERS)]
             
             if suggestions:
-                response += f"\n\nRecently mentioned:\n"
+                parts.append("\n\nRecently mentioned:\n")
                 for svc in suggestions:
-                    response += f"• {svc}\n"
-                response += "\nOr type 'show all' to see everything!"
+                    parts.append(f"• {svc}\n")
+                parts.append("\nOr type 'show all' to see everything!")
             
-            return response
+            return "".join(parts)
         
         elif issue == "service_not_found":
-            return "I couldn't find that service. Could you double-check the name, or type 'show all' to see what's available?"
+            return self.SERVICE_NOT_FOUND_MESSAGE
         
         elif issue == "ambiguous_query":
-            return "I'm not quite sure what you're asking. Could you be a bit more specific? Or type 'help' to see what I can do!"
+            return self.AMBIGUOUS_QUERY_MESSAGE
         
-        return "I'm not sure I understood that. Could you rephrase?"
+        return self.UNCLEAR_MESSAGE
     
     def generate_error_response(self, error_type: str, details: str = "") -> str:
         """Generate friendly error messages"""
         
         if error_type == "api_error":
-            return random.choice([
-                "Oops! I'm having trouble connecting to Dynatrace. Can you try again in a moment?",
-                "Hmm, Dynatrace isn't responding. Mind trying that again?",
-                "Something went wrong on my end. Want to give it another shot?",
-            ])
+            return _choice(self.API_ERROR_MESSAGES)
         
         elif error_type == "no_data":
-            return "I couldn't find any data for that timeframe. Try a different time period?"
+            return self.NO_DATA_MESSAGE
         
         elif error_type == "general":
             return f"Something unexpected happened. {details if details else 'Please try again!'}"
         
-        return "Oops! Something went wrong. Mind trying again?"
+        return self.DEFAULT_ERROR_MESSAGE
     
     def generate_help_response(self, context: Dict = None) -> str:
         """Generate contextual help message"""
         
-        intro = random.choice([
-            "I'm here to help! Here's what I can do:",
-            "Happy to help! I can assist with:",
-            "Sure thing! Here are my capabilities:",
-            "No problem! I can help you with:",
-        ])
-        
-        help_text = f"""{intro}
-
-**🔍 Check Service Health**
-• "How is ordercontroller doing?"
-• "Check payment-api"
-• "Any issues with checkout-service?"
-
-**📋 List Services**
-• "Show me all services"
-• "What services do I have?"
-
-**📊 Analyze Metrics**
-• "What's the performance of auth-service?"
-• "Show me metrics for the last 4 hours"
-
-**🔧 Troubleshoot**
-• "Why is inventory-api slow?"
-• "What's wrong with my services?"
-
-**💡 Tip:** Just talk naturally - I understand conversational queries!
-
-What would you like to know?"""
+        intro = _choice(self.HELP_INTROS)
         
-        return help_text
+        return intro + self.HELP_BODY
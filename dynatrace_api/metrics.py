@@ -3,9 +3,10 @@ Dynatrace Metrics API Module
 Handle metrics-related API calls with proper error handling
 """
 import requests
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from config.settings import config
 from utils.logger import setup_logger
+from dynatrace_api.session import get_session
 from utils.timeframe import timeframe_to_dynatrace
 
 logger = setup_logger(__name__)
@@ -13,9 +14,13 @@ logger = setup_logger(__name__)
 class DynatraceMetricsAPI:
     """Dynatrace Metrics API handler"""
     
+    # Entities per bulk request (keeps the entitySelector well under URL limits)
+    BULK_CHUNK_SIZE = 50
+    
     def __init__(self):
         self.base_url = config.DT_BASE_URL
         self.headers = config.get_auth_headers()
+        self.session = get_session()
         
         # Define available metrics
         self.metric_keys = [
@@ -58,7 +63,7 @@ class DynatraceMetricsAPI:
         
         try:
             logger.info(f"Fetching metrics for entity {entity_id}")
-            response = requests.get(url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data = response.json()
@@ -68,6 +73,90 @@ class DynatraceMetricsAPI:
             logger.error(f"Error fetching metrics: {e}")
             return self._empty_metrics()
     
+    def get_metrics_bulk(
+        self,
+        entity_ids: List[str],
+        timeframe: str = "2h"
+    ) -> Dict[str, Dict[str, any]]:
+        """
+        Fetch service metrics for many entities with one request per chunk
+        
+        Args:
+            entity_ids: Dynatrace entity IDs (split into BULK_CHUNK_SIZE chunks)
+            timeframe: Time period (e.g., "2h", "30m", "7d")
+            
+        Returns:
+            Dictionary mapping entity_id -> metric values (N/A when missing)
+        """
+        results = {entity_id: self._empty_metrics() for entity_id in entity_ids}
+        url = f"{self.base_url}/api/v2/metrics/query"
+        
+        try:
+            from_time_str, to_time_str = timeframe_to_dynatrace(timeframe)
+        except ValueError as e:
+            logger.error(f"Invalid timeframe: {e}")
+            return results
+        
+        for i in range(0, len(entity_ids), self.BULK_CHUNK_SIZE):
+            chunk = entity_ids[i:i + self.BULK_CHUNK_SIZE]
+            params = {
+                "metricSelector": ",".join(self.metric_keys),
+                "resolution": "Inf",
+                "from": from_time_str,
+                "to": to_time_str,
+                "entitySelector": f"entityId({','.join(chunk)})"
+            }
+            
+            try:
+                logger.info(f"Fetching metrics for {len(chunk)} entities")
+                response = self.session.get(url, headers=self.headers, params=params, timeout=15)
+                response.raise_for_status()
+                
+                self._parse_bulk_response(response.json(), results)
+                
+            except requests.RequestException as e:
+                logger.error(f"Error fetching bulk metrics: {e}")
+        
+        return results
+    
+    def _parse_bulk_response(self, data: Dict, results: Dict[str, Dict]):
+        """
+        Fill per-entity metrics from a multi-entity response
+        
+        Args:
+            data: Raw API response
+            results: entity_id -> metrics dictionary, updated in place
+        """
+        for metric in data.get("result", []):
+            metric_id = metric.get("metricId", "")
+            
+            for data_point in metric.get("data", []):
+                values = data_point.get("values", [])
+                if not values:
+                    continue
+                
+                entity_id = data_point.get("dimensionMap", {}).get("dt.entity.service")
+                if entity_id is None:
+                    dimensions = data_point.get("dimensions", [])
+                    entity_id = dimensions[0] if dimensions else None
+                
+                metrics_result = results.get(entity_id)
+                if metrics_result is not None:
+                    self._apply_metric_value(metrics_result, metric_id, values[0])
+    
+    def _apply_metric_value(self, metrics_result: Dict, metric_id: str, value):
+        """Store one metric value in its formatted slot"""
+        if value is None:
+            return
+        if metric_id == "builtin:service.errors.total.count":
+            metrics_result["error_count"] = int(value)
+        elif metric_id == "builtin:service.response.time":
+            metrics_result["response_time"] = round(value, 2)
+        elif metric_id == "builtin:service.requestCount.total":
+            metrics_result["request_count"] = int(value)
+        elif metric_id == "builtin:service.errors.total.rate":
+            metrics_result["failure_rate"] = round(value * 100, 2)
+    
     def _parse_metrics_response(self, data: Dict) -> Dict[str, any]:
         """
         Parse the metrics API response
@@ -93,16 +182,7 @@ class DynatraceMetricsAPI:
                 if not values:
                     continue
                 
-                value = values[0]
-                
-                if metric_id == "builtin:service.errors.total.count":
-                    metrics_result["error_count"] = int(value)
-                elif metric_id == "builtin:service.response.time":
-                    metrics_result["response_time"] = round(value, 2)
-                elif metric_id == "builtin:service.requestCount.total":
-                    metrics_result["request_count"] = int(value)
-                elif metric_id == "builtin:service.errors.total.rate":
-                    metrics_result["failure_rate"] = round(value * 100, 2)
+                self._apply_metric_value(metrics_result, metric_id, values[0])
         
         logger.info(f"Parsed metrics: {metrics_result}")
         return metrics_result
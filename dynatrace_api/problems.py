@@ -6,6 +6,7 @@ import requests
 from typing import List, Dict, Optional
 from config.settings import config
 from utils.logger import setup_logger
+from dynatrace_api.session import get_session
 
 logger = setup_logger(__name__)
 
@@ -15,6 +16,7 @@ class DynatraceProblemsAPI:
     def __init__(self):
         self.base_url = config.DT_BASE_URL
         self.headers = config.get_auth_headers()
+        self.session = get_session()
     
     def get_problems_for_service(
         self, 
@@ -55,7 +57,7 @@ class DynatraceProblemsAPI:
         
         try:
             logger.info(f"Fetching problems for service: {service_name} (entity: {entity_id})")
-            response = requests.get(url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data = response.json()
@@ -189,12 +191,14 @@ class DynatraceProblemsAPI:
         # Service is in affected entities
         return "indirectly_affected"
     
-    def get_all_open_problems(self, limit: int = 100) -> List[Dict]:
+    def get_all_open_problems(self, limit: int = 100, raise_errors: bool = False) -> List[Dict]:
         """
         Get all currently open problems (for dashboard views)
         
         Args:
             limit: Maximum number of problems to return
+            raise_errors: Re-raise request errors instead of returning []
+                          (so callers can tell "no problems" from "fetch failed")
             
         Returns:
             List of open problems
@@ -207,7 +211,7 @@ class DynatraceProblemsAPI:
         
         try:
             logger.info("Fetching all open problems")
-            response = requests.get(url, headers=self.headers, params=params, timeout=15)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=15)
             response.raise_for_status()
             
             data = response.json()
@@ -218,6 +222,8 @@ class DynatraceProblemsAPI:
             
         except requests.RequestException as e:
             logger.error(f"Error fetching open problems: {e}")
+            if raise_errors:
+                raise
             return []
     
     def categorize_problems(self, problems: List[Dict]) -> Dict[str, List[Dict]]:
@@ -267,7 +273,7 @@ class DynatraceProblemsAPI:
         
         try:
             logger.info(f"Fetching details for problem: {problem_id}")
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = self.session.get(url, headers=self.headers, timeout=15)
             response.raise_for_status()
             
             return response.json()
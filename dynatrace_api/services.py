@@ -6,6 +6,7 @@ import requests
 from typing import Optional, List, Dict
 from config.settings import config
 from utils.logger import setup_logger
+from dynatrace_api.session import get_session
 
 logger = setup_logger(__name__)
 
@@ -15,6 +16,7 @@ class DynatraceServicesAPI:
     def __init__(self):
         self.base_url = config.DT_BASE_URL
         self.headers = config.get_auth_headers()
+        self.session = get_session()
     
     def get_service_entity_id(self, service_name: str) -> Optional[str]:
         """
@@ -34,7 +36,7 @@ class DynatraceServicesAPI:
         
         try:
             logger.info(f"Searching for service: {service_name}")
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
             
             entities = response.json().get("entities", [])
@@ -70,7 +72,7 @@ class DynatraceServicesAPI:
         
         try:
             logger.info(f"Fetching up to {limit} services")
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self.session.get(url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
             
             entities = response.json().get("entities", [])
@@ -95,7 +97,7 @@ class DynatraceServicesAPI:
         
         try:
             logger.info(f"Fetching details for entity: {entity_id}")
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
             
             return response.json()
@@ -0,0 +1,38 @@
+"""
+Dynatrace HTTP Session
+One pooled requests.Session shared by every Dynatrace API client
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Enough connections for the KB build pool plus the per-check API pool
+POOL_SIZE = 32
+
+# br needs the brotli package (see requirements.txt) for urllib3 to decode it
+ACCEPT_ENCODING = "br, gzip, deflate"
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Get the shared Dynatrace session (created on first use)
+    
+    Keep-alive connections are reused across API clients and threads, so
+    repeated calls skip the TCP/TLS handshake. Brotli is offered on top of
+    requests' default gzip/deflate (urllib3 decodes it via the brotli package
+    in requirements.txt); it usually compresses the large JSON bodies better.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+                session.headers["Accept"] = "application/json; charset=utf-8"
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
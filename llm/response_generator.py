@@ -2,12 +2,38 @@
 AI Response Generator Module - Multi-Provider Support
 Supports: OpenAI, Anthropic Claude, Google Gemini, Ollama (Local/Free), and Fallback
 """
-from typing import Dict, List, Optional
+import hashlib
+import json
+import threading
+from typing import Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
 from config.settings import config
+from utils.cache import TTLCache
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+_ollama_session = None
+_ollama_session_lock = threading.Lock()
+
+def get_ollama_session() -> requests.Session:
+    """
+    Get the shared Ollama session (created on first use)
+    
+    One keep-alive pool for every Ollama caller - the generators' sync and
+    streaming calls and AIQueryEngine's parse, hedged and warm-up requests.
+    """
+    global _ollama_session
+    if _ollama_session is None:
+        with _ollama_session_lock:
+            if _ollama_session is None:
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(pool_maxsize=32))
+                session.mount("https://", HTTPAdapter(pool_maxsize=32))
+                _ollama_session = session
+    return _ollama_session
+
 class AIResponseGenerator:
     """Generate conversational responses using multiple AI providers"""
     
@@ -22,6 +48,10 @@ class AIResponseGenerator:
         self.provider = provider or self._detect_provider()
         self.client = None
         self.model = None
+        self._http = None  # Keep-alive session for Ollama (set by _init_ollama)
+        
+        # Generated analyses keyed on service + bucketed metrics (repeat checks skip the LLM)
+        self.analysis_cache = TTLCache(maxsize=256, ttl=config.ANALYSIS_CACHE_TTL)
         
         # Initialize the selected provider
         self._initialize_provider()
@@ -95,12 +125,15 @@ class AIResponseGenerator:
     def _init_ollama(self):
         """Initialize Ollama (100% Free, runs locally!)"""
         try:
-            import requests
+            # Pooled keep-alive connections, shared with every other Ollama caller
+            http = get_ollama_session()
+            
             # Test Ollama connection
             ollama_url = getattr(config, 'OLLAMA_URL', 'http://localhost:11434')
-            response = requests.get(f"{ollama_url}/api/tags", timeout=2)
+            response = http.get(f"{ollama_url}/api/tags", timeout=2)
             
             if response.status_code == 200:
+                self._http = http
                 self.client = ollama_url
                 self.model = getattr(config, 'OLLAMA_MODEL', 'llama2')  # Default model
                 logger.info(f"Ollama initialized with model: {self.model}")
@@ -132,6 +165,117 @@ class AIResponseGenerator:
         Returns:
             Natural language response
         """
+        cache_key = self._analysis_cache_key(service_name, metrics, problems, insights, timeframe)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        system_prompt, user_prompt = self._analysis_prompts(
+            service_name, metrics, problems, insights, timeframe
+        )
+        
+        # Call the appropriate provider
+        try:
+            if self.provider == 'openai':
+                response = self._call_openai(system_prompt, user_prompt)
+            elif self.provider == 'anthropic':
+                response = self._call_anthropic(system_prompt, user_prompt)
+            elif self.provider == 'gemini':
+                response = self._call_gemini(system_prompt, user_prompt)
+            elif self.provider == 'ollama':
+                response = self._call_ollama(system_prompt, user_prompt)
+            else:
+                return self._fallback_response(service_name, metrics, problems, insights)
+            self.analysis_cache.set(cache_key, response)
+            return response
+        except Exception as e:
+            logger.error(f"AI generation failed: {e}")
+            return self._fallback_response(service_name, metrics, problems, insights)
+    
+    def generate_service_analysis_stream(
+        self,
+        service_name: str,
+        metrics: Dict,
+        problems: List[Dict],
+        insights: Dict,
+        timeframe: str
+    ) -> Iterator[str]:
+        """
+        Same as generate_service_analysis, but yields the text as it is generated
+        
+        Falls back to the template response if the provider fails before
+        producing any text.
+        
+        Yields:
+            Response text chunks
+        """
+        if self.provider not in ('openai', 'anthropic', 'gemini', 'ollama'):
+            yield self._fallback_response(service_name, metrics, problems, insights)
+            return
+        
+        cache_key = self._analysis_cache_key(service_name, metrics, problems, insights, timeframe)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        system_prompt, user_prompt = self._analysis_prompts(
+            service_name, metrics, problems, insights, timeframe
+        )
+        
+        chunks = []
+        try:
+            for chunk in self._stream_provider(system_prompt, user_prompt):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"AI streaming failed: {e}")
+            if not chunks:
+                yield self._fallback_response(service_name, metrics, problems, insights)
+            return
+        
+        if chunks:
+            self.analysis_cache.set(cache_key, "".join(chunks))
+    
+    def _analysis_cache_key(
+        self,
+        service_name: str,
+        metrics: Dict,
+        problems: List[Dict],
+        insights: Dict,
+        timeframe: str
+    ) -> str:
+        """
+        Hash of what the analysis depends on, with metrics bucketed
+        
+        Response time is rounded to 10 ms and failure rate to 0.1%, so
+        small jitter between repeat checks still hits the cache.
+        """
+        def bucket(value, ndigits):
+            return round(value, ndigits) if isinstance(value, (int, float)) else value
+        
+        key = {
+            'service': service_name,
+            'timeframe': timeframe,
+            'status': insights.get('status'),
+            'response_time': bucket(metrics.get('response_time'), -1),
+            'failure_rate': bucket(metrics.get('failure_rate'), 1),
+            'error_count': metrics.get('error_count'),
+            'problems': sorted(p.get('title', '') for p in problems)
+        }
+        return hashlib.blake2b(
+            json.dumps(key, sort_keys=True, default=str).encode(), digest_size=16
+        ).hexdigest()
+    
+    def _analysis_prompts(
+        self,
+        service_name: str,
+        metrics: Dict,
+        problems: List[Dict],
+        insights: Dict,
+        timeframe: str
+    ) -> tuple:
+        """Build (system_prompt, user_prompt) for a service analysis"""
         # Build context
         context = self._build_context(service_name, metrics, problems, insights, timeframe)
         
@@ -154,21 +298,62 @@ Provide a clear, professional analysis that includes:
 
 Keep it concise but informative."""
         
-        # Call the appropriate provider
-        try:
-            if self.provider == 'openai':
-                return self._call_openai(system_prompt, user_prompt)
-            elif self.provider == 'anthropic':
-                return self._call_anthropic(system_prompt, user_prompt)
-            elif self.provider == 'gemini':
-                return self._call_gemini(system_prompt, user_prompt)
-            elif self.provider == 'ollama':
-                return self._call_ollama(system_prompt, user_prompt)
-            else:
-                return self._fallback_response(service_name, metrics, problems, insights)
-        except Exception as e:
-            logger.error(f"AI generation failed: {e}")
-            return self._fallback_response(service_name, metrics, problems, insights)
+        return system_prompt, user_prompt
+    
+    def _stream_provider(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Call the active provider with streaming, yielding text chunks"""
+        if self.provider == 'openai':
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        elif self.provider == 'anthropic':
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=500,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}]
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+        
+        elif self.provider == 'gemini':
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            for chunk in self.client.generate_content(full_prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
+        
+        elif self.provider == 'ollama':
+            with self._http.post(
+                f"{self.client}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": f"{system_prompt}\n\n{user_prompt}",
+                    "stream": True
+                },
+                stream=True,
+                timeout=30
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API error: {response.status_code}")
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    part = json.loads(line)
+                    if part.get('response'):
+                        yield part['response']
+                    if part.get('done'):
+                        break
     
     def _call_openai(self, system_prompt: str, user_prompt: str) -> str:
         """Call OpenAI API"""
@@ -204,10 +389,7 @@ Keep it concise but informative."""
     
     def _call_ollama(self, system_prompt: str, user_prompt: str) -> str:
         """Call Ollama local API"""
-        import requests
-        import json
-        
-        response = requests.post(
+        response = self._http.post(
             f"{self.client}/api/generate",
             json={
                 "model": self.model,
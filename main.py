@@ -3,15 +3,22 @@ Dynatrace AI Assistant - Universal Query System
 Now answers ANY analytical question about services!
 """
 import streamlit as st
+import difflib
+import heapq
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Iterator, Union
 import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from config.settings import config
 from utils.logger import setup_logger
+from utils.cache import TTLCache
 from utils.timeframe import human_readable_timeframe
-from prompt_handler.intent_parser import AIIntentParser
+from prompt_handler.intent_parser import AIIntentParser, is_analytical_query, is_help_request
 from dynatrace_api.services import DynatraceServicesAPI
 from dynatrace_api.metrics import DynatraceMetricsAPI
 from dynatrace_api.problems import DynatraceProblemsAPI
@@ -27,23 +34,51 @@ logger = setup_logger(__name__)
 services_api = DynatraceServicesAPI()
 metrics_api = DynatraceMetricsAPI()
 problems_api = DynatraceProblemsAPI()
-ai_generator = AIResponseGenerator()
-intent_parser = AIIntentParser(ai_client=ai_generator)
-
-# Import conversational generator
-try:
-    from conversational_response_generator import ConversationalResponseGenerator
-    conversational_gen = ConversationalResponseGenerator(ai_generator)
-    USE_CONVERSATIONAL = True
-except:
-    USE_CONVERSATIONAL = False
-    conversational_gen = None
+
+# Streamlit re-runs this script on every interaction - anything holding
+# threads or caches is created once per process via st.cache_resource
+@st.cache_resource
+def get_ai_generator() -> AIResponseGenerator:
+    """AI provider client (keeps its analysis cache across reruns)"""
+    return AIResponseGenerator()
+
+@st.cache_resource
+def get_intent_parser() -> AIIntentParser:
+    """Intent parser (keeps its parse cache across reruns)"""
+    return AIIntentParser(ai_client=get_ai_generator())
+
+@st.cache_resource
+def get_api_executor() -> ThreadPoolExecutor:
+    """Pool for overlapping the independent Dynatrace calls of a single-service check"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="dt-api")
+
+@st.cache_resource
+def get_service_data_cache() -> TTLCache:
+    """Short-lived (metrics, problems) per (entity_id, timeframe) for single-service checks"""
+    return TTLCache(maxsize=128, ttl=config.SERVICE_DATA_CACHE_TTL)
+
+ai_generator = get_ai_generator()
+intent_parser = get_intent_parser()
+api_executor = get_api_executor()
+service_data_cache = get_service_data_cache()
+
+@st.cache_resource
+def get_conversational_generator():
+    """Import and build the conversational generator once per process (None if unavailable)"""
+    try:
+        from conversational_response_generator import ConversationalResponseGenerator
+        return ConversationalResponseGenerator(ai_generator)
+    except Exception as e:
+        logger.warning(f"Conversational responses disabled: {e}")
+        return None
 
 # Initialize knowledge base and query engine (singleton per session)
 @st.cache_resource
 def get_knowledge_base():
-    """Initialize and cache knowledge base"""
-    kb = ServiceKnowledgeBase()
+    """Initialize and cache knowledge base (loaded from disk if recent, else built in the background)"""
+    kb = ServiceKnowledgeBase(cache_path=config.KB_CACHE_PATH if config.KB_CACHE_TTL > 0 else None)
+    if not (kb.cache_path and kb.load(kb.cache_path, max_age=config.KB_CACHE_TTL)):
+        kb.start_background_build()
     return kb
 
 @st.cache_resource
@@ -53,10 +88,16 @@ def get_query_engine():
     query_engine = AIQueryEngine(kb, ai_generator)
     return query_engine
 
+@st.cache_data(ttl=300, show_spinner=False)
+def get_service_list() -> dict:
+    """Lowercased name -> display name index for "did you mean" suggestions (refreshed every 5 min)"""
+    services = services_api.list_services(limit=100)
+    return {name.lower(): name for name in (s.get("displayName") for s in services) if name}
+
 def initialize_session_state():
     """Initialize session state"""
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = new_chat_history()
         
         welcome_msg = """👋 Hey! I'm your Dynatrace AI Assistant with **superpowers**!
 
@@ -76,11 +117,12 @@ I can now answer **any question** about your services:
 
 Just ask me anything! 😊"""
         
-        st.session_state.messages.append({
+        # Pinned above the bounded history so it is never evicted
+        st.session_state.welcome = {
             "role": "assistant",
             "content": welcome_msg,
             "timestamp": datetime.now()
-        })
+        }
     
     if "conversation_context" not in st.session_state:
         st.session_state.conversation_context = {
@@ -98,6 +140,10 @@ Just ask me anything! 😊"""
     if "kb_initialized" not in st.session_state:
         st.session_state.kb_initialized = False
 
+def new_chat_history() -> deque:
+    """Empty chat history (oldest messages drop off once full; the welcome is kept separately)"""
+    return deque(maxlen=max(config.MAX_CHAT_HISTORY - 1, 1))
+
 def add_message(role: str, content: str):
     """Add message to chat"""
     st.session_state.messages.append({
@@ -105,28 +151,10 @@ def add_message(role: str, content: str):
         "content": content,
         "timestamp": datetime.now()
     })
-    
-    if len(st.session_state.messages) > config.MAX_CHAT_HISTORY:
-        welcome = st.session_state.messages[0]
-        recent = st.session_state.messages[-(config.MAX_CHAT_HISTORY-1):]
-        st.session_state.messages = [welcome] + recent
-
-def is_analytical_query(user_input: str) -> bool:
-    """Detect if query is analytical (needs knowledge base)"""
-    analytical_keywords = [
-        'which', 'what', 'show me all', 'list all', 'compare',
-        'highest', 'lowest', 'worst', 'best', 'most',
-        'today', 'overview', 'summary', 'health', 'status',
-        'how many', 'count', 'all services', 'everything',
-        'with problems', 'with errors', 'critical', 'warning'
-    ]
-    
-    q_lower = user_input.lower()
-    return any(keyword in q_lower for keyword in analytical_keywords)
 
-def handle_analytical_query(user_input: str, query_engine) -> str:
+def handle_analytical_query(user_input: str, query_engine) -> Union[str, Iterator[str]]:
     """Handle analytical queries using query engine"""
-    kb = get_knowledge_base()
+    kb = query_engine.kb
     
     # Check KB status
     if not kb.is_ready():
@@ -135,19 +163,18 @@ def handle_analytical_query(user_input: str, query_engine) -> str:
         else:
             return "⏳ Let me gather data from all your services first. This will take about 30-60 seconds..."
     
-    # Use query engine
-    with st.spinner("🔍 Analyzing all services..."):
-        result = query_engine.answer_question(user_input)
-        return result.get('answer', 'Sorry, I had trouble with that query.')
+    # Use query engine - the answer is streamed into the chat as it is generated
+    return query_engine.answer_question_stream(user_input)
 
-def handle_single_service_query(intent: dict) -> str:
+def handle_single_service_query(intent: dict) -> Union[str, Iterator[str]]:
     """Handle single service queries (existing logic)"""
     service_name = intent.get("service_name")
     timeframe = intent.get("timeframe", "2h")
     
     if not service_name:
         recent = get_recent_services_from_history()
-        if USE_CONVERSATIONAL and conversational_gen:
+        conversational_gen = get_conversational_generator()
+        if conversational_gen:
             return conversational_gen.generate_clarification_request(
                 "no_service_name",
                 suggestions=recent
@@ -167,14 +194,14 @@ def handle_single_service_query(intent: dict) -> str:
         return f"I couldn't find '{service_name}'. Try 'show all services' to see what's available."
     
     with st.spinner(f"🔍 Analyzing {service_name}..."):
-        problems = problems_api.get_problems_for_service(service_name, entity_id, timeframe)
-        metrics = metrics_api.get_service_metrics(entity_id, timeframe)
+        metrics, problems = fetch_service_data(service_name, entity_id, timeframe)
         insights = metrics_api.analyze_metrics(metrics)
         
         update_context(intent, service_name)
         display_metrics_ui(service_name, metrics, problems, insights)
         
-        if USE_CONVERSATIONAL and conversational_gen:
+        conversational_gen = get_conversational_generator()
+        if conversational_gen:
             conv_context = get_conversational_context()
             response = conversational_gen.generate_service_analysis(
                 service_name=service_name,
@@ -185,7 +212,7 @@ def handle_single_service_query(intent: dict) -> str:
                 context=conv_context
             )
         else:
-            response = ai_generator.generate_service_analysis(
+            response = ai_generator.generate_service_analysis_stream(
                 service_name=service_name,
                 metrics=metrics,
                 problems=problems,
@@ -195,6 +222,51 @@ def handle_single_service_query(intent: dict) -> str:
         
         return response
 
+def fetch_service_data(service_name: str, entity_id: str, timeframe: str) -> tuple:
+    """Get (metrics, problems) for one service, reusing a recent/prewarmed fetch"""
+    key = (entity_id, timeframe)
+    cached = service_data_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Problems and metrics are independent requests - fetch them concurrently
+    problems_future = api_executor.submit(
+        problems_api.get_problems_for_service, service_name, entity_id, timeframe
+    )
+    metrics = metrics_api.get_service_metrics(entity_id, timeframe)
+    data = (metrics, problems_future.result())
+    service_data_cache.set(key, data)
+    return data
+
+def _prewarm_service(service_name: str, entity_id: str, timeframe: str):
+    """Fetch one service into the cache (runs on the API pool, so no nested submits)"""
+    metrics = metrics_api.get_service_metrics(entity_id, timeframe)
+    problems = problems_api.get_problems_for_service(service_name, entity_id, timeframe)
+    service_data_cache.set((entity_id, timeframe), (metrics, problems))
+
+def prewarm_hot_services(kb):
+    """Prefetch the session's most-checked services once a KB build has landed"""
+    context = st.session_state.conversation_context
+    counts = context["service_check_count"]
+    timeframe = context.get("last_timeframe") or "2h"
+    
+    name_index = kb.service_name_index()
+    for service_name in heapq.nlargest(config.PREWARM_TOP_SERVICES, counts, key=counts.get):
+        # Counts are keyed by the name as typed; the KB only matches exact display names
+        display_name = name_index.get(service_name.lower(), service_name)
+        record = kb.get_service(display_name)
+        if record and record.get('entity_id'):
+            api_executor.submit(_prewarm_service, display_name, record['entity_id'], timeframe)
+
+def prewarm_if_due(kb):
+    """Re-warm the hot services when a new build lands or the last warm has expired"""
+    warmed_at = st.session_state.get("prewarmed_at", 0.0)
+    if (st.session_state.get("prewarmed_kb_version") != kb.version()
+            or time.monotonic() - warmed_at >= config.SERVICE_DATA_CACHE_TTL):
+        prewarm_hot_services(kb)
+        st.session_state.prewarmed_kb_version = kb.version()
+        st.session_state.prewarmed_at = time.monotonic()
+
 def update_context(intent: dict, service_name: str = None):
     """Update conversation context"""
     context = st.session_state.conversation_context
@@ -212,42 +284,54 @@ def update_context(intent: dict, service_name: str = None):
     
     context["last_analysis_time"] = datetime.now()
 
-def get_conversational_context() -> dict:
+def get_conversational_context() -> "ConversationContext":
     """Get context for conversational responses"""
+    from conversational_response_generator import ConversationContext
+    
     context = st.session_state.conversation_context
     last_service = context.get("last_service")
     
-    return {
-        "is_followup": False,
-        "frequently_checked": context["service_check_count"].get(last_service, 0) >= 3 if last_service else False,
-        "recent_services": list(context["service_check_count"].keys())[-3:]
-    }
+    return ConversationContext(
+        is_followup=False,
+        frequently_checked=context["service_check_count"].get(last_service, 0) >= 3 if last_service else False,
+        recent_services=tuple(context["service_check_count"].keys())[-3:]
+    )
 
 def get_recent_services_from_history() -> list:
     """Get recently mentioned services"""
     context = st.session_state.conversation_context
-    return [svc for svc, count in sorted(
-        context["service_check_count"].items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:3]]
+    counts = context["service_check_count"]
+    return heapq.nlargest(3, counts, key=counts.get)
 
 def find_similar_services(service_name: str) -> list:
     """Find similar service names"""
     try:
-        all_services = services_api.list_services(limit=100)
-        similar = []
+        # The KB already holds every name - only hit the API before the first build
+        kb = get_knowledge_base()
+        names = kb.service_name_index() if kb.is_ready() else get_service_list()
         service_lower = service_name.lower()
         
-        for service in all_services:
-            name = service.get("displayName", "").lower()
-            if service_lower in name or name in service_lower:
-                similar.append(service.get("displayName"))
+        # Typo-tolerant matches first (best ratio first), then plain substring hits
+        matches = difflib.get_close_matches(service_lower, names, n=5, cutoff=0.6)
+        if len(matches) < 5:
+            matches += [name for name in names
+                        if (service_lower in name or name in service_lower) and name not in matches]
         
-        return similar[:5]
+        return [names[name] for name in matches[:5]]
     except:
         return []
 
+# Health banner per insights status (no banner for unknown)
+STATUS_BANNERS = {
+    "healthy": (st.success, "✅ Healthy"),
+    "warning": (st.warning, "⚠️ Warning"),
+    "critical": (st.error, "🔴 Critical")
+}
+
+def _with_unit(value, unit: str):
+    """Append a unit to numeric metric values; 'N/A' and other placeholders pass through"""
+    return f"{value}{unit}" if isinstance(value, (int, float)) else value
+
 def display_metrics_ui(service_name: str, metrics: dict, problems: list, insights: dict):
     """Display metrics visually"""
     st.markdown(f"### 📊 {service_name}")
@@ -257,13 +341,11 @@ def display_metrics_ui(service_name: str, metrics: dict, problems: list, insight
     with col1:
         st.metric("Errors", metrics.get("error_count", "N/A"))
     with col2:
-        rt = metrics.get("response_time", "N/A")
-        st.metric("Response Time", f"{rt}ms" if isinstance(rt, (int, float)) else rt)
+        st.metric("Response Time", _with_unit(metrics.get("response_time", "N/A"), "ms"))
     with col3:
         st.metric("Requests", metrics.get("request_count", "N/A"))
     with col4:
-        fr = metrics.get("failure_rate", "N/A")
-        st.metric("Failure Rate", f"{fr}%" if isinstance(fr, (int, float)) else fr)
+        st.metric("Failure Rate", _with_unit(metrics.get("failure_rate", "N/A"), "%"))
     
     if problems:
         with st.expander(f"🚨 {len(problems)} Problem(s)", expanded=len(problems) <= 3):
@@ -272,36 +354,40 @@ def display_metrics_ui(service_name: str, metrics: dict, problems: list, insight
                 icon = "🔴" if relevance == "root_cause" else "⚠️"
                 st.markdown(f"{icon} **{problem.get('title', 'Unknown')}**")
     
-    status = insights.get("status", "unknown")
-    if status == "healthy":
-        st.success("✅ Healthy")
-    elif status == "warning":
-        st.warning("⚠️ Warning")
-    elif status == "critical":
-        st.error("🔴 Critical")
-
-def process_user_input(user_input: str) -> str:
-    """Process user input - route to appropriate handler"""
+    banner = STATUS_BANNERS.get(insights.get("status", "unknown"))
+    if banner:
+        show, message = banner
+        show(message)
+
+def process_user_input(user_input: str) -> Union[str, Iterator[str]]:
+    """Process user input - route to appropriate handler (AI answers come back as a text stream)"""
     try:
         query_engine = get_query_engine()
         
-        # Check if analytical query
+        # Cheap local checks first - no LLM call for these
+        if is_help_request(user_input):
+            return get_help_text()
         if is_analytical_query(user_input):
             return handle_analytical_query(user_input, query_engine)
         
-        # Parse intent for single service queries
-        intent = intent_parser.parse(user_input)
+        # One parse both routes the question and extracts the intent
+        intent = intent_parser.parse_with_route(user_input)
         
         if not intent:
             return "I'm not sure what you're asking. Try 'help' or ask about a specific service!"
         
         intent_type = intent.get("type")
         
+        # Any phrasing of "list services" gets the canonical KB query, whichever route the AI picked
+        if intent_type == "list_services":
+            return handle_analytical_query("show me all services", query_engine)
+        
+        if intent.get("route") == "analytical":
+            return handle_analytical_query(user_input, query_engine)
+        
         # Handle different intent types
         if intent_type in ["check_abnormality", "service_details", "metrics_analysis"]:
             return handle_single_service_query(intent)
-        elif intent_type == "list_services":
-            return handle_analytical_query("show me all services", query_engine)
         elif intent_type == "general_question":
             q_lower = user_input.lower()
             if any(w in q_lower for w in ['help', 'what can you do']):
@@ -331,6 +417,34 @@ def get_help_text() -> str:
 
 Just ask naturally - I'll understand! 😊"""
 
+@st.fragment(run_every=5)
+def render_kb_status(kb):
+    """Sidebar KB status - polls on its own every 5s instead of rerunning the whole app"""
+    kb_status = kb.get_status()
+    
+    # A build started/finished since the last full run - rerun the app so the banner and prewarm catch up
+    if st.session_state.get("kb_status_ready", kb_status['is_ready']) != kb_status['is_ready']:
+        st.session_state.kb_status_ready = kb_status['is_ready']
+        st.rerun()
+    st.session_state.kb_status_ready = kb_status['is_ready']
+    
+    if kb_status['is_ready']:
+        # Prewarmed data expires like any fetch, so the 5s poll keeps it topped up
+        prewarm_if_due(kb)
+        st.success(f"✅ KB Ready ({kb_status['service_count']} services)")
+        if st.button("🔄 Refresh Data"):
+            with st.spinner("Refreshing..."):
+                refreshed = kb.build(use_cache=False)
+            if refreshed:
+                st.success("Data refreshed!")
+                st.rerun()
+            else:
+                st.error(f"❌ Refresh failed: {kb.get_status()['error'] or 'knowledge base busy'}")
+    elif kb_status['is_building']:
+        st.warning("⏳ Building knowledge base...")
+    else:
+        st.error("❌ KB not ready")
+
 def main():
     """Main application"""
     st.set_page_config(
@@ -348,11 +462,18 @@ def main():
     kb = get_knowledge_base()
     query_engine = get_query_engine()
     
-    if not st.session_state.kb_initialized and not kb.is_ready():
-        with st.spinner("🔄 Initializing knowledge base (gathering data from all services)... This takes 30-60 seconds on first run."):
-            kb.build()
+    # Warm the suggestion list off the script thread so the first typo doesn't wait on the API
+    if "service_list_warmed" not in st.session_state:
+        api_executor.submit(get_service_list)
+        st.session_state.service_list_warmed = True
+    
+    if not kb.is_ready():
+        if kb.is_building:
+            st.info("🔄 Gathering data from all services in the background (30-60 seconds on first run). Single-service checks work right away.")
+        elif not st.session_state.kb_initialized:
+            # Previous build failed - retry once per session
+            kb.start_background_build()
             st.session_state.kb_initialized = True
-            st.rerun()
     
     # Sidebar
     with st.sidebar:
@@ -370,18 +491,7 @@ def main():
         """)
         
         # KB Status
-        kb_status = kb.get_status()
-        if kb_status['is_ready']:
-            st.success(f"✅ KB Ready ({kb_status['service_count']} services)")
-            if st.button("🔄 Refresh Data"):
-                with st.spinner("Refreshing..."):
-                    kb.build()
-                st.success("Data refreshed!")
-                st.rerun()
-        elif kb_status['is_building']:
-            st.warning("⏳ Building knowledge base...")
-        else:
-            st.error("❌ KB not ready")
+        render_kb_status(kb)
         
         st.markdown("### 🤖 AI Provider")
         provider = ai_generator.provider.title()
@@ -391,7 +501,8 @@ def main():
             st.success(f"✅ {provider}")
         
         if st.button("🗑️ Clear Chat"):
-            st.session_state.messages = []
+            st.session_state.messages = new_chat_history()
+            st.session_state.welcome = None
             st.session_state.conversation_context = {
                 "last_service": None,
                 "last_intent": None,
@@ -403,6 +514,9 @@ def main():
             st.rerun()
     
     # Display chat
+    if st.session_state.welcome:
+        with st.chat_message("assistant"):
+            st.markdown(st.session_state.welcome["content"])
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -416,7 +530,10 @@ def main():
         with st.chat_message("assistant"):
             try:
                 response = process_user_input(prompt)
-                st.markdown(response)
+                if isinstance(response, str):
+                    st.markdown(response)
+                else:
+                    response = st.write_stream(response)
                 add_message("assistant", response)
             except Exception as e:
                 error_msg = "I ran into an issue. Could you try rephrasing?"
@@ -3,11 +3,71 @@ AI-Powered Intent Parser Module
 Uses AI to understand user queries naturally instead of hardcoded patterns
 """
 import re
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from config.settings import config
+from utils.cache import TTLCache
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Static so providers can reuse the prompt prefix across calls
+INTENT_SYSTEM_PROMPT = """You are an intent classifier for a Dynatrace monitoring chatbot.
+Your job is to extract structured information from user queries.
+
+Available intent types:
+- check_abnormality: User wants to check service health, issues, problems, errors
+- list_services: User wants to see all available services
+- service_details: User wants detailed info about a specific service
+- metrics_analysis: User wants to analyze performance metrics
+- compare_services: User wants to compare multiple services
+- troubleshoot: User wants help diagnosing an issue
+- general_question: General question about monitoring or the system
+
+Extract:
+1. route: "analytical" if the question is about many/all services (rankings, counts, filters, overviews, comparisons), otherwise "service"
+2. intent_type: One of the above types
+3. service_name: The service name mentioned (if any)
+4. timeframe: Time period like "2h", "30m", "7d" (default: "2h")
+5. additional_context: Any other relevant information
+
+Respond ONLY with valid JSON in this exact format:
+{
+  "route": "service",
+  "intent_type": "check_abnormality",
+  "service_name": "ordercontroller",
+  "timeframe": "2h",
+  "additional_context": ""
+}
+
+If no service name is mentioned, use null for service_name.
+If no timeframe is mentioned, use "2h".
+"""
+
+ANALYTICAL_KEYWORDS = (
+    'which', 'what', 'show me all', 'list all', 'compare',
+    'highest', 'lowest', 'worst', 'best', 'most',
+    'today', 'overview', 'summary', 'health', 'status',
+    'how many', 'count', 'all services', 'everything',
+    'with problems', 'with errors', 'critical', 'warning'
+)
+# Substring match, like the keyword scan it replaces ("unhealthy", "healthiest" count)
+_ANALYTICAL_RE = re.compile("|".join(map(re.escape, ANALYTICAL_KEYWORDS)), re.IGNORECASE)
+# The whole message is a help request (checked before the analytical keywords, which contain "what")
+_HELP_RE = re.compile(r"^\s*(?:help|what can you do)\W*$", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def is_analytical_query(user_input: str) -> bool:
+    """Detect if query is analytical (needs knowledge base)"""
+    return _ANALYTICAL_RE.search(user_input) is not None
+
+def is_help_request(user_input: str) -> bool:
+    """Detect a bare help request ("help", "what can you do?")"""
+    return _HELP_RE.match(user_input) is not None
+
+# Intent types answered from the knowledge base rather than a single service
+_ANALYTICAL_INTENTS = frozenset({'list_services', 'compare_services'})
+
 class AIIntentParser:
     """
     AI-powered intent parser that uses LLM to understand user queries
@@ -23,6 +83,32 @@ class AIIntentParser:
         """
         self.ai_client = ai_client
         self.use_ai = ai_client is not None
+        # Normalized query -> parsed intent (repeat questions skip the LLM)
+        self.intent_cache = TTLCache(maxsize=512, ttl=config.PARSE_CACHE_TTL)
+    
+    def parse_with_route(self, user_input: str) -> Optional[Dict]:
+        """
+        Parse user input and decide how to answer it, in one (cached) call
+        
+        Args:
+            user_input: Raw user query
+            
+        Returns:
+            Intent dictionary (as parse()) plus "route": "analytical" or "service"
+        """
+        if not user_input or not user_input.strip():
+            return None
+        
+        cache_key = " ".join(user_input.lower().split())
+        cached = self.intent_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "raw_query": user_input.strip()}
+        
+        intent, from_ai = self._parse(user_input)
+        # Pattern fallbacks are cheap to redo; caching one would pin it after a brief AI outage
+        if intent and from_ai:
+            self.intent_cache.set(cache_key, intent)
+        return intent
     
     def parse(self, user_input: str) -> Optional[Dict]:
         """
@@ -34,8 +120,12 @@ class AIIntentParser:
         Returns:
             Intent dictionary with type, service_name, timeframe, etc.
         """
+        return self._parse(user_input)[0]
+    
+    def _parse(self, user_input: str) -> Tuple[Optional[Dict], bool]:
+        """Parse user input; returns (intent, True if the AI produced it)"""
         if not user_input or not user_input.strip():
-            return None
+            return None, False
         
         user_input_clean = user_input.strip()
         
@@ -45,14 +135,14 @@ class AIIntentParser:
                 intent = self._parse_with_ai(user_input_clean)
                 if intent:
                     logger.info(f"AI parsed intent: {intent}")
-                    return intent
+                    return intent, True
             except Exception as e:
                 logger.warning(f"AI parsing failed, falling back to patterns: {e}")
         
         # Fallback to pattern-based parsing
         intent = self._parse_with_patterns(user_input_clean)
         logger.info(f"Pattern parsed intent: {intent}")
-        return intent
+        return intent, False
     
     def _parse_with_ai(self, user_input: str) -> Optional[Dict]:
         """
@@ -64,35 +154,7 @@ class AIIntentParser:
         Returns:
             Parsed intent dictionary
         """
-        system_prompt = """You are an intent classifier for a Dynatrace monitoring chatbot.
-Your job is to extract structured information from user queries.
-
-Available intent types:
-- check_abnormality: User wants to check service health, issues, problems, errors
-- list_services: User wants to see all available services
-- service_details: User wants detailed info about a specific service
-- metrics_analysis: User wants to analyze performance metrics
-- compare_services: User wants to compare multiple services
-- troubleshoot: User wants help diagnosing an issue
-- general_question: General question about monitoring or the system
-
-Extract:
-1. intent_type: One of the above types
-2. service_name: The service name mentioned (if any)
-3. timeframe: Time period like "2h", "30m", "7d" (default: "2h")
-4. additional_context: Any other relevant information
-
-Respond ONLY with valid JSON in this exact format:
-{
-  "intent_type": "check_abnormality",
-  "service_name": "ordercontroller",
-  "timeframe": "2h",
-  "additional_context": ""
-}
-
-If no service name is mentioned, use null for service_name.
-If no timeframe is mentioned, use "2h".
-"""
+        system_prompt = INTENT_SYSTEM_PROMPT
         
         user_prompt = f"User query: {user_input}"
         
@@ -112,8 +174,13 @@ If no timeframe is mentioned, use "2h".
             intent_data = json.loads(response_clean)
             
             # Validate and normalize
+            intent_type = intent_data.get("intent_type", "general_question")
+            route = intent_data.get("route")
+            if route not in ("analytical", "service"):
+                route = "analytical" if intent_type in _ANALYTICAL_INTENTS else "service"
             return {
-                "type": intent_data.get("intent_type", "general_question"),
+                "type": intent_type,
+                "route": route,
                 "service_name": intent_data.get("service_name"),
                 "timeframe": intent_data.get("timeframe", "2h"),
                 "additional_context": intent_data.get("additional_context", ""),
@@ -148,7 +215,11 @@ If no timeframe is mentioned, use "2h".
                 model=self.ai_client.model,
                 max_tokens=200,
                 temperature=0.3,
-                system=system_prompt,
+                system=[{
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }],
                 messages=[
                     {"role": "user", "content": user_prompt}
                 ]
@@ -203,6 +274,7 @@ If no timeframe is mentioned, use "2h".
         
         return {
             "type": intent_type,
+            "route": "analytical" if intent_type in _ANALYTICAL_INTENTS else "service",
             "service_name": service_name,
             "timeframe": timeframe,
             "additional_context": "",
@@ -2,65 +2,277 @@
 Service Knowledge Base - Universal Data Layer
 Collects and stores ALL service metrics and problems for intelligent querying
 """
+import os
+import pickle
+import sys
 import time
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
 from dynatrace_api.services import DynatraceServicesAPI
 from dynatrace_api.metrics import DynatraceMetricsAPI
 from dynatrace_api.problems import DynatraceProblemsAPI
+from config.settings import config
+from utils.cache import TTLCache
+from utils.rate_limit import TokenBucket
 from utils.logger import setup_logger
 import threading
 
 logger = setup_logger(__name__)
 
+# Metrics kept as NumPy columns for ranking/filtering
+METRIC_FIELDS = ('error_count', 'response_time', 'failure_rate', 'request_count')  # under record['metrics']
+COLUMN_METRICS = METRIC_FIELDS + ('health_score', 'problem_count')
+
+STATUS_CODES = {'healthy': 0, 'warning': 1, 'critical': 2}
+_STATUS_NAMES = tuple(STATUS_CODES)  # status code -> name
+UNKNOWN_STATUS = 255
+
+# The metrics DynatraceMetricsAPI.analyze_metrics looks at
+_ANALYZED_FIELDS = ('failure_rate', 'response_time', 'error_count')
+
+# Packed per-service table: one row per service, one field per metric
+TABLE_DTYPE = np.dtype(
+    [(metric, '<f8') for metric in COLUMN_METRICS] + [('status', '<u1')]
+)
+
+# Shared read-only fallback for missing nested dicts (never stored in a record)
+_EMPTY = MappingProxyType({})
+
+class _PenaltyLadder(NamedTuple):
+    """
+    Health score deductions for one metric
+    
+    A value above thresholds[i - 1] (and not above thresholds[i]) costs
+    penalties[i]; a left searchsorted finds i, so bounds are exclusive.
+    """
+    thresholds: tuple
+    penalties: tuple
+
+_ERROR_LADDER = _PenaltyLadder((10, 100, 500, 1000), (0, 10, 20, 30, 40))
+_RESPONSE_TIME_LADDER = _PenaltyLadder((500, 1000, 2000), (0, 10, 20, 30))  # ms
+_FAILURE_RATE_LADDER = _PenaltyLadder((1, 2, 5, 10), (0, 5, 15, 25, 40))  # %
+
+# Problem severities that make a service critical
+_CRITICAL_SEVERITIES = frozenset({'ERROR', 'CUSTOM_ALERT'})
+
+def _numeric(value) -> float:
+    """Convert a metric value to float, NaN when missing or 'N/A'"""
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+def _penalties(values: np.ndarray, ladder: _PenaltyLadder) -> np.ndarray:
+    """Look up the penalty for each value in a penalty ladder (0 where the value is NaN)"""
+    found = np.asarray(ladder.penalties)[np.searchsorted(ladder.thresholds, values, side='left')]
+    return np.where(np.isnan(values), 0, found)
+
+def _service_ids(problem: Dict):
+    """Yield the service IDs a problem touches (impacted, affected and root cause entities)"""
+    # Dynatrace always nests the ID as entity['entityId']['id']; malformed entries are skipped
+    for key in ('impactedEntities', 'affectedEntities'):
+        for entity in problem.get(key, ()):
+            try:
+                entity_id = entity['entityId']['id']
+            except (KeyError, TypeError):
+                continue
+            if entity_id and entity_id.startswith('SERVICE-'):
+                yield entity_id
+    try:
+        root_id = problem['rootCauseEntity']['entityId']['id']
+    except (KeyError, TypeError):
+        return
+    if root_id and root_id.startswith('SERVICE-'):
+        yield root_id
+
+def _mean_present(column: np.ndarray) -> float:
+    """Mean of the non-NaN values in a column, 0 if there are none"""
+    present = column[~np.isnan(column)]
+    return float(present.mean()) if present.size else 0
+
+class _KBData:
+    """
+    One published knowledge base: records, columnar view and stats
+    
+    Never modified once published (apart from the lazily filled sort
+    cache), so a reader holding one sees a consistent build throughout.
+    """
+    
+    __slots__ = (
+        'services', 'problems_index', 'aggregated_stats', 'last_updated', 'version',
+        'names', 'table', 'columns', 'sorted_idx', 'status_buckets', 'with_problems',
+        'snapshot', 'name_index', 'id_by_name'
+    )
+    
+    def __init__(
+        self,
+        services: Dict,
+        problems_index: Dict,
+        aggregated_stats: Dict,
+        last_updated: Optional[datetime],
+        version: int,
+        **view
+    ):
+        """
+        Args:
+            services: entity_id -> complete service data
+            problems_index: problem_id -> problem details
+            aggregated_stats: Output of _calculate_aggregates
+            last_updated: When the data was built (None = never)
+            version: Data version, bumped with every publish
+            view: Columnar view from _build_columns (index i <-> names[i])
+        """
+        self.services = services
+        self.problems_index = problems_index
+        self.aggregated_stats = aggregated_stats
+        self.last_updated = last_updated
+        self.version = version
+        for field, value in view.items():
+            setattr(self, field, value)
+
 class ServiceKnowledgeBase:
     """
     Central knowledge base containing ALL service data
     Enables answering any comparative or analytical question
     """
     
-    def __init__(self):
+    # Threads shared by every build (metrics chunks + the problems fetch)
+    FETCH_POOL_SIZE = 10
+    
+    # _KBData fields persisted by save()/load(); the columnar view is rebuilt on load
+    _PERSISTED_FIELDS = ('services', 'problems_index', 'aggregated_stats', 'last_updated')
+    # Bump whenever the persisted record shape changes; load() ignores other versions
+    _CACHE_FORMAT = 2  # records keyed by entity_id, problems referenced via 'problem_ids'
+    
+    def __init__(self, cache_path: Optional[str] = None):
+        """
+        Args:
+            cache_path: Pickle file the KB is saved to after each build (None = no disk cache)
+        """
+        self.cache_path = cache_path
         self.services_api = DynatraceServicesAPI()
         self.metrics_api = DynatraceMetricsAPI()
         self.problems_api = DynatraceProblemsAPI()
         
-        # Core data structures
-        self.services = {}  # service_name -> complete service data
-        self.problems_index = {}  # problem_id -> problem details
-        self.service_by_entity = {}  # entity_id -> service_name (for lookups)
-        self.aggregated_stats = {}
+        # Everything readers see, swapped as one reference per build
+        self._data = _KBData({}, {}, {}, None, 0, **self._build_columns({}))
+        
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=self.FETCH_POOL_SIZE, thread_name_prefix="kb-fetch"
+        )
+        # Paces build requests; threads only wait when the burst is used up
+        self._rate_limiter = TokenBucket(config.DT_API_RATE_LIMIT, config.DT_API_BURST)
+        
+        # API sub-results reused by rebuilds within their TTL
+        self._services_cache = TTLCache(maxsize=1, ttl=config.KB_SERVICES_TTL)
+        self._metrics_cache = TTLCache(maxsize=4096, ttl=config.KB_METRICS_TTL)  # (entity_id, timeframe) -> metrics
+        self._problems_cache = TTLCache(maxsize=8, ttl=config.KB_PROBLEMS_TTL)  # timeframe -> (problem count, map)
         
         # Metadata
-        self.last_updated = None
         self.is_building = False
         self.build_error = None
-        self._lock = threading.Lock()
+        # Held for the whole of a build (or a load); taken without waiting, so
+        # is_building is just a flag for readers and needs no lock of its own
+        self._build_gate = threading.Lock()
+        self._inflight = None  # Future of the latest build, shared by callers that join it
     
-    def build(self, timeframe: str = "2h", max_workers: int = 10):
+    def build(self, timeframe: str = "2h", max_workers: int = 10, use_cache: bool = True) -> bool:
         """
         Build complete knowledge base by fetching ALL data
         
+        If a build is already running, waits for that one instead of
+        starting another (its arguments win).
+        
         Args:
             timeframe: Time period for metrics (default 2h)
             max_workers: Parallel workers for fetching (default 10)
+            use_cache: Reuse services/metrics/problems fetched within their TTLs
+                       (False refetches everything)
+            
+        Returns:
+            True if the build succeeded
+        """
+        future, owner = self._begin_build()
+        if owner:
+            self._run_build(future, timeframe, max_workers, use_cache)
+        return future.result()
+    
+    def start_background_build(
+        self,
+        timeframe: str = "2h",
+        max_workers: int = 10,
+        use_cache: bool = True
+    ) -> bool:
         """
-        with self._lock:
-            if self.is_building:
-                logger.warning("Build already in progress, skipping...")
-                return
+        Build the knowledge base on a daemon thread and return immediately
+        
+        is_building is set before this returns, so callers can show a
+        "building" state straight away.
+        
+        Returns:
+            False if a build was already in progress
+        """
+        future, owner = self._begin_build()
+        if not owner:
+            return False
+        threading.Thread(
+            target=self._run_build,
+            args=(future, timeframe, max_workers, use_cache),
+            name="kb-build",
+            daemon=True
+        ).start()
+        return True
+    
+    def _begin_build(self) -> Tuple[Future, bool]:
+        """
+        Claim a build, or join the one in flight
+        
+        Returns:
+            (future resolving to whether the build succeeded,
+             True if the caller claimed the build and must run it)
+        """
+        if self._build_gate.acquire(blocking=False):
+            future = Future()
+            self._inflight = future
             self.is_building = True
             self.build_error = None
+            return future, True
         
+        inflight = self._inflight
+        if inflight is not None and not inflight.done():
+            logger.info("Build already in progress, joining it...")
+            return inflight, False
+        
+        # The gate is held by load() (or a build that is just starting) - nothing to join
+        logger.warning("Knowledge base busy, skipping build...")
+        skipped = Future()
+        skipped.set_result(False)
+        return skipped, False
+    
+    def _run_build(self, future: Future, timeframe: str, max_workers: int, use_cache: bool = True):
+        """Fetch everything and rebuild the KB (caller has claimed the build via future)"""
         try:
             logger.info("🔄 Building service knowledge base...")
             start_time = time.time()
+            self._prepare_fetch_caches(use_cache)
             
             # Step 1: Fetch all services
             logger.info("📋 Fetching service list...")
-            services_list = self._fetch_all_services()
+            services_list = self._services_cache.get('services')
+            if services_list is None:
+                services_list = self._fetch_all_services()
+                if services_list:
+                    self._services_cache.set('services', services_list)
             logger.info(f"✅ Found {len(services_list)} services")
             
+            # Problems don't depend on the service list - fetch them while metrics load
+            cached_problems = self._problems_cache.get(timeframe)
+            problems_future = None
+            if cached_problems is None:
+                self._rate_limiter.acquire()
+                problems_future = self._fetch_pool.submit(self._fetch_all_problems, timeframe)
+            
             # Step 2: Fetch metrics for all services in parallel
             logger.info("📊 Fetching metrics for all services (parallel)...")
             all_metrics = self._fetch_all_metrics_parallel(services_list, timeframe, max_workers)
@@ -68,29 +280,106 @@ class ServiceKnowledgeBase:
             
             # Step 3: Fetch all problems
             logger.info("🚨 Fetching all problems...")
-            all_problems, service_problems_map = self._fetch_all_problems(timeframe)
-            logger.info(f"✅ Found {len(all_problems)} problems")
+            if problems_future is not None:
+                cached_problems = problems_future.result()
+                if cached_problems is None:
+                    cached_problems = (0, {})  # fetch failed - build without problems, cache nothing
+                else:
+                    self._problems_cache.set(timeframe, cached_problems)
+            problem_count, service_problems_map = cached_problems
+            logger.info(f"✅ Found {problem_count} problems")
             
-            # Step 4: Build service records
+            # Step 4: Build service records (into locals - readers keep the old KB meanwhile)
             logger.info("🔨 Building service records...")
-            self._build_service_records(services_list, all_metrics, service_problems_map)
+            services, problems_index = self._build_service_records(
+                services_list, all_metrics, service_problems_map
+            )
             
             # Step 5: Calculate aggregates
             logger.info("📈 Calculating aggregate statistics...")
-            self._calculate_aggregates()
+            view = self._build_columns(services)
+            last_updated = datetime.now()
+            aggregated_stats = self._calculate_aggregates(services, view, last_updated)
             
             # Step 6: Finalize
-            self.last_updated = datetime.now()
+            self._publish(services, problems_index, aggregated_stats, last_updated, view)
             elapsed = time.time() - start_time
             
-            logger.info(f"✅ Knowledge base ready! {len(self.services)} services in {elapsed:.1f}s")
+            logger.info(f"✅ Knowledge base ready! {len(services)} services in {elapsed:.1f}s")
+            
+            if self.cache_path:
+                self.save(self.cache_path)
             
         except Exception as e:
             logger.error(f"❌ Error building knowledge base: {e}", exc_info=True)
             self.build_error = str(e)
         finally:
-            with self._lock:
-                self.is_building = False
+            self.is_building = False
+            self._build_gate.release()
+            future.set_result(self.build_error is None)
+    
+    def save(self, path: str):
+        """Write the KB data to a pickle file (atomically, via a temp file)"""
+        data = self._data
+        state = {field: getattr(data, field) for field in self._PERSISTED_FIELDS}
+        state['format'] = self._CACHE_FORMAT
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            logger.info(f"💾 Saved knowledge base to {path}")
+        except Exception as e:
+            logger.warning(f"Could not save knowledge base to {path}: {e}")
+    
+    def load(self, path: str, max_age: Optional[float] = None) -> bool:
+        """
+        Load KB data saved by save()
+        
+        Args:
+            path: Pickle file to read
+            max_age: Ignore the file if its mtime is older than this many seconds
+            
+        Returns:
+            True if the KB was loaded and is ready
+        """
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+                return False
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not load knowledge base from {path}: {e}")
+            return False
+        
+        if not isinstance(state, dict) or state.get('format') != self._CACHE_FORMAT:
+            logger.info(f"Ignoring knowledge base cache {path}: saved by an older version")
+            return False
+        
+        if not self._build_gate.acquire(blocking=False):
+            return False
+        try:
+            self._publish(
+                state['services'], state['problems_index'], state['aggregated_stats'],
+                state['last_updated'], self._build_columns(state['services'])
+            )
+        finally:
+            self._build_gate.release()
+        
+        logger.info(f"✅ Loaded knowledge base from {path} ({len(state['services'])} services)")
+        return True
+    
+    def _prepare_fetch_caches(self, use_cache: bool):
+        """Sweep expired sub-results before a build, or drop them all for a forced refetch"""
+        caches = (self._services_cache, self._metrics_cache, self._problems_cache)
+        for cache in caches:
+            if use_cache:
+                cache.purge_expired()
+            else:
+                cache.clear()
     
     def _fetch_all_services(self) -> List[Dict]:
         """Fetch complete service list"""
@@ -108,237 +397,257 @@ class ServiceKnowledgeBase:
         max_workers: int
     ) -> Dict:
         """
-        Fetch metrics for all services in parallel with rate limiting
+        Fetch metrics for all services in bulk chunks (chunks fetched in parallel)
         
         Returns:
             Dict mapping entity_id -> metrics
         """
         all_metrics = {}
+        chunk_size = self.metrics_api.BULK_CHUNK_SIZE
+        display_names = {svc.get('entityId'): svc.get('displayName', svc.get('entityId'))
+                         for svc in services_list}
         
-        # Create batches to respect rate limits (10 at a time)
-        batch_size = min(max_workers, 10)
+        # Services with the same analyzed values (e.g. idle, all zeros) share one analysis
+        analyses = {}
+        analyze_metrics = self.metrics_api.analyze_metrics
         
-        def fetch_service_metrics(service):
-            """Helper to fetch metrics for one service"""
-            entity_id = service.get('entityId')
-            display_name = service.get('displayName', entity_id)
-            
-            try:
-                metrics = self.metrics_api.get_service_metrics(entity_id, timeframe)
-                insights = self.metrics_api.analyze_metrics(metrics)
-                return entity_id, {
-                    'metrics': metrics,
-                    'insights': insights,
-                    'display_name': display_name
-                }
-            except Exception as e:
-                logger.warning(f"Failed to fetch metrics for {display_name}: {e}")
-                return entity_id, None
-        
-        # Process in parallel batches
-        for i in range(0, len(services_list), batch_size):
-            batch = services_list[i:i+batch_size]
-            
-            with ThreadPoolExecutor(max_workers=batch_size) as executor:
-                future_to_service = {
-                    executor.submit(fetch_service_metrics, svc): svc 
-                    for svc in batch
-                }
-                
-                for future in as_completed(future_to_service):
-                    entity_id, result = future.result()
-                    if result:
-                        all_metrics[entity_id] = result
-            
-            # Small delay between batches to be nice to API
-            if i + batch_size < len(services_list):
-                time.sleep(0.5)
+        def add_result(entity_id, metrics):
+            # Type is part of the key: 5 and 5.0 are equal but render differently in concerns
+            key = tuple((type(value), value) for value in map(metrics.get, _ANALYZED_FIELDS))
+            insights = analyses.get(key)
+            if insights is None:
+                if any(value_type in (int, float) for value_type, _ in key):
+                    insights = analyze_metrics(metrics)
+                else:
+                    # Nothing to analyze (missing/'N/A'): skip analyze_metrics; with no
+                    # problems either, _determine_statuses still counts the service healthy
+                    insights = {'status': 'unknown', 'concerns': [], 'recommendations': []}
+                analyses[key] = insights
+            all_metrics[entity_id] = {
+                'metrics': metrics,
+                'insights': insights,
+                'display_name': display_names.get(entity_id, entity_id)
+            }
+        
+        # Reuse metrics fetched within KB_METRICS_TTL; only the rest go to the API
+        entity_ids = []
+        for svc in services_list:
+            entity_id = svc.get('entityId')
+            if not entity_id:
+                continue
+            cached = self._metrics_cache.get((entity_id, timeframe))
+            if cached is None:
+                entity_ids.append(entity_id)
+            else:
+                add_result(entity_id, cached)
+        
+        # The pool is shared; this caps how many of its threads one build's metrics use
+        in_flight = threading.Semaphore(max(max_workers, 1))
+        
+        def fetch_chunk(chunk):
+            """Helper to fetch metrics for up to chunk_size services in one request"""
+            with in_flight:
+                self._rate_limiter.acquire()
+                try:
+                    return self.metrics_api.get_metrics_bulk(chunk, timeframe)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch metrics for {len(chunk)} services: {e}")
+                    return {}
+        
+        chunks = [entity_ids[i:i + chunk_size] for i in range(0, len(entity_ids), chunk_size)]
+        
+        # One request per chunk instead of one per service; chunks run in parallel
+        chunk_results = list(self._fetch_pool.map(fetch_chunk, chunks))
+        
+        for chunk_metrics in chunk_results:
+            for entity_id, metrics in chunk_metrics.items():
+                add_result(entity_id, metrics)
+                # All-N/A usually means the request failed - don't pin that for the TTL
+                if any(isinstance(value, (int, float)) for value in metrics.values()):
+                    self._metrics_cache.set((entity_id, timeframe), metrics)
         
         return all_metrics
     
-    def _fetch_all_problems(self, timeframe: str) -> tuple:
+    def _fetch_all_problems(self, timeframe: str) -> Optional[tuple]:
         """
         Fetch all problems and map to services
         
         Returns:
-            (all_problems_list, service_to_problems_mapping)
+            (problem_count, service_to_problems_mapping); problems that
+            touch no service are counted but not kept. None if the fetch failed
         """
         try:
             # Get all open problems
-            all_problems = self.problems_api.get_all_open_problems(limit=500)
+            all_problems = self.problems_api.get_all_open_problems(limit=500, raise_errors=True)
             
             # Build service -> problems mapping
-            service_problems = {}
-            
+            service_problems = defaultdict(list)
             for problem in all_problems:
-                # Get all affected services from the problem
-                affected_entities = []
-                
-                # Check impacted entities
-                for entity in problem.get('impactedEntities', []):
-                    entity_id = entity.get('entityId', {}).get('id')
-                    if entity_id and entity_id.startswith('SERVICE-'):
-                        affected_entities.append(entity_id)
-                
-                # Check affected entities
-                for entity in problem.get('affectedEntities', []):
-                    entity_id = entity.get('entityId', {}).get('id')
-                    if entity_id and entity_id.startswith('SERVICE-'):
-                        affected_entities.append(entity_id)
-                
-                # Check root cause
-                root_cause = problem.get('rootCauseEntity', {})
-                root_id = root_cause.get('entityId', {}).get('id')
-                if root_id and root_id.startswith('SERVICE-'):
-                    affected_entities.append(root_id)
-                
-                # Map to services
-                for entity_id in set(affected_entities):  # Remove duplicates
-                    if entity_id not in service_problems:
-                        service_problems[entity_id] = []
+                severity = problem.get('severityLevel')
+                if isinstance(severity, str):
+                    problem['severityLevel'] = sys.intern(severity)
+                for entity_id in set(_service_ids(problem)):  # Remove duplicates
                     service_problems[entity_id].append(problem)
             
-            return all_problems, service_problems
+            # Plain dict so lookups for unaffected services don't insert empty lists
+            return len(all_problems), dict(service_problems)
             
         except Exception as e:
             logger.error(f"Error fetching problems: {e}")
-            return [], {}
+            return None
     
     def _build_service_records(
         self,
         services_list: List[Dict],
         all_metrics: Dict,
         service_problems: Dict
-    ):
-        """Build complete service records"""
-        for service in services_list:
+    ) -> tuple:
+        """
+        Build complete service records
+        
+        Returns:
+            (entity_id -> record, problem_id -> problem)
+        
+        Records reference their problems by ID (see get_problems); the
+        problem objects themselves live once, in problems_index.
+        
+        Records are assembled in two passes: the first gathers what scoring
+        needs into columns, health scores and statuses are then computed for
+        every service at once, and the second pass fills in the records.
+        """
+        problems_index = {}
+        total = len(services_list)
+        entries = []
+        error_counts = np.empty(total)
+        response_times = np.empty(total)
+        failure_rates = np.empty(total)
+        problem_counts = np.empty(total, dtype=np.int64)
+        critical_counts = np.empty(total, dtype=np.int64)
+        insight_codes = np.empty(total, dtype=np.uint8)
+        
+        for i, service in enumerate(services_list):
             entity_id = service.get('entityId')
-            display_name = service.get('displayName', entity_id)
-            service_type = service.get('properties', {}).get('serviceType', 'Unknown')
             
             # Get metrics and problems
-            metrics_data = all_metrics.get(entity_id, {})
-            metrics = metrics_data.get('metrics', {})
-            insights = metrics_data.get('insights', {})
-            problems = service_problems.get(entity_id, [])
+            metrics_data = all_metrics.get(entity_id) or _EMPTY
+            metrics = metrics_data.get('metrics') or {}
+            insights = metrics_data.get('insights') or {}
+            problems = service_problems.get(entity_id) or []
+            entries.append((service, entity_id, metrics, insights, problems))
             
-            # Calculate health score
-            health_score = self._calculate_health_score(metrics, problems)
+            get = metrics.get
+            error_count = get('error_count')
+            error_counts[i] = error_count if isinstance(error_count, int) else np.nan
+            response_times[i] = _numeric(get('response_time'))
+            failure_rates[i] = _numeric(get('failure_rate'))
+            problem_counts[i] = len(problems)
+            critical_counts[i] = sum(1 for p in problems if p.get('severityLevel') in _CRITICAL_SEVERITIES)
+            insight_codes[i] = STATUS_CODES.get(insights.get('status'), UNKNOWN_STATUS)
+        
+        health_scores = self._calculate_health_scores(
+            error_counts, response_times, failure_rates, problem_counts, critical_counts
+        ).tolist()
+        status_codes = self._determine_statuses(insight_codes, problem_counts, critical_counts).tolist()
+        
+        services = {}
+        for (service, entity_id, metrics, insights, problems), health_score, status_code in zip(
+            entries, health_scores, status_codes
+        ):
+            get = service.get
+            service_type = (get('properties') or _EMPTY).get('serviceType', 'Unknown')
+            if isinstance(service_type, str):
+                service_type = sys.intern(service_type)  # one shared copy per type across records
             
-            # Determine status
-            status = self._determine_status(insights.get('status', 'unknown'), problems)
+            # Index problems; the record keeps only their IDs
+            problem_ids = []
+            for problem in problems:
+                problem_id = problem.get('problemId')
+                if problem_id:
+                    problems_index[problem_id] = problem
+                    problem_ids.append(problem_id)
             
             # Build complete record
-            self.services[display_name] = {
+            services[entity_id] = {
                 'entity_id': entity_id,
-                'display_name': display_name,
+                'display_name': get('displayName', entity_id),
                 'type': service_type,
                 'metrics': metrics,
-                'problems': problems,
+                'problem_ids': problem_ids,
                 'problem_count': len(problems),
                 'health_score': health_score,
-                'status': status,
+                'status': _STATUS_NAMES[status_code],
                 'insights': insights,
-                'tags': service.get('tags', []),
-                'management_zones': service.get('managementZones', [])
+                'tags': get('tags', []),
+                'management_zones': get('managementZones', [])
             }
             
-            # Build reverse lookup
-            self.service_by_entity[entity_id] = display_name
-            
-            # Index problems
-            for problem in problems:
-                problem_id = problem.get('problemId')
-                if problem_id:
-                    self.problems_index[problem_id] = problem
+        return services, problems_index
     
-    def _calculate_health_score(self, metrics: Dict, problems: List) -> int:
+    def _calculate_health_scores(
+        self,
+        error_counts: np.ndarray,
+        response_times: np.ndarray,
+        failure_rates: np.ndarray,
+        problem_counts: np.ndarray,
+        critical_counts: np.ndarray
+    ) -> np.ndarray:
         """
-        Calculate 0-100 health score
+        Calculate 0-100 health scores, one per service
         100 = perfect health, 0 = critical issues
+        
+        Metrics are NaN where the service has no usable value (no deduction).
         """
-        score = 100.0
-        
-        # Deduct for errors
-        error_count = metrics.get('error_count', 0)
-        if isinstance(error_count, int):
-            if error_count > 1000:
-                score -= 40
-            elif error_count > 500:
-                score -= 30
-            elif error_count > 100:
-                score -= 20
-            elif error_count > 10:
-                score -= 10
-        
-        # Deduct for slow response time
-        response_time = metrics.get('response_time', 0)
-        if isinstance(response_time, (int, float)):
-            if response_time > 2000:
-                score -= 30
-            elif response_time > 1000:
-                score -= 20
-            elif response_time > 500:
-                score -= 10
-        
-        # Deduct for failure rate
-        failure_rate = metrics.get('failure_rate', 0)
-        if isinstance(failure_rate, (int, float)):
-            if failure_rate > 10:
-                score -= 40
-            elif failure_rate > 5:
-                score -= 25
-            elif failure_rate > 2:
-                score -= 15
-            elif failure_rate > 1:
-                score -= 5
+        score = np.full(len(problem_counts), 100, dtype=np.int64)
+        
+        # Deduct for errors, slow response time and failure rate
+        score -= _penalties(error_counts, _ERROR_LADDER)
+        score -= _penalties(response_times, _RESPONSE_TIME_LADDER)
+        score -= _penalties(failure_rates, _FAILURE_RATE_LADDER)
         
         # Deduct for problems
-        critical_problems = sum(1 for p in problems if p.get('severityLevel') in ['ERROR', 'CUSTOM_ALERT'])
-        score -= critical_problems * 15
-        score -= (len(problems) - critical_problems) * 8
+        score -= critical_counts * 15
+        score -= (problem_counts - critical_counts) * 8
         
-        return max(0, int(score))
+        return np.maximum(score, 0)
     
-    def _determine_status(self, insights_status: str, problems: List) -> str:
-        """Determine overall service status"""
-        critical_problems = [p for p in problems if p.get('severityLevel') in ['ERROR', 'CUSTOM_ALERT']]
-        
-        if critical_problems or insights_status == 'critical':
-            return 'critical'
-        elif problems or insights_status == 'warning':
-            return 'warning'
-        else:
-            return 'healthy'
+    def _determine_statuses(
+        self,
+        insight_codes: np.ndarray,
+        problem_counts: np.ndarray,
+        critical_counts: np.ndarray
+    ) -> np.ndarray:
+        """Determine overall status codes (STATUS_CODES values), one per service"""
+        critical = (critical_counts > 0) | (insight_codes == STATUS_CODES['critical'])
+        warning = (problem_counts > 0) | (insight_codes == STATUS_CODES['warning'])
+        return np.where(
+            critical, STATUS_CODES['critical'],
+            np.where(warning, STATUS_CODES['warning'], STATUS_CODES['healthy'])
+        )
     
-    def _calculate_aggregates(self):
-        """Calculate aggregate statistics across all services"""
-        total = len(self.services)
+    def _calculate_aggregates(self, services: Dict, view: Dict, last_updated: datetime) -> Dict:
+        """Calculate aggregate statistics across all services (view from _build_columns)"""
+        total = len(services)
         
         if total == 0:
-            self.aggregated_stats = {}
-            return
-        
-        healthy = sum(1 for s in self.services.values() if s['status'] == 'healthy')
-        warning = sum(1 for s in self.services.values() if s['status'] == 'warning')
-        critical = sum(1 for s in self.services.values() if s['status'] == 'critical')
+            return {}
         
-        health_scores = [s['health_score'] for s in self.services.values()]
-        avg_health = sum(health_scores) / len(health_scores) if health_scores else 0
+        # Reduce the packed table (built first) instead of walking the records
+        table = view['table']
+        # One counting pass over the status codes instead of a comparison per status
+        status_counts = np.bincount(table['status'], minlength=len(STATUS_CODES))
+        healthy = int(status_counts[STATUS_CODES['healthy']])
+        warning = int(status_counts[STATUS_CODES['warning']])
+        critical = int(status_counts[STATUS_CODES['critical']])
         
-        total_problems = sum(s['problem_count'] for s in self.services.values())
-        services_with_problems = sum(1 for s in self.services.values() if s['problem_count'] > 0)
+        avg_health = float(table['health_score'].mean())
+        total_problems = int(table['problem_count'].sum())
+        services_with_problems = len(view['with_problems'])
         
-        # Calculate metric averages
-        error_counts = [s['metrics'].get('error_count', 0) for s in self.services.values() 
-                       if isinstance(s['metrics'].get('error_count'), int)]
-        avg_errors = sum(error_counts) / len(error_counts) if error_counts else 0
+        # Metric averages over services that report a value (missing values are NaN)
+        avg_errors = _mean_present(table['error_count'])
+        avg_response_time = _mean_present(table['response_time'])
         
-        response_times = [s['metrics'].get('response_time', 0) for s in self.services.values() 
-                         if isinstance(s['metrics'].get('response_time'), (int, float))]
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-        
-        self.aggregated_stats = {
+        return {
             'total_services': total,
             'healthy_count': healthy,
             'warning_count': warning,
@@ -349,20 +658,249 @@ class ServiceKnowledgeBase:
             'services_with_problems': services_with_problems,
             'avg_error_count': round(avg_errors, 1),
             'avg_response_time': round(avg_response_time, 1),
-            'last_updated': self.last_updated
+            'last_updated': last_updated
         }
     
-    def get_service(self, service_name: str) -> Optional[Dict]:
-        """Get complete data for a specific service"""
-        return self.services.get(service_name)
+    def _build_columns(self, services: Dict) -> Dict:
+        """
+        Build the packed service table and the lookups aligned with it
+        
+        One structured array holds every metric plus the status code, so a
+        fused query (e.g. top critical services by failure rate) reads a
+        single buffer. Non-numeric metric values are stored as NaN.
+        
+        Returns:
+            The columnar view, keyed by _KBData field
+        """
+        records = list(services.values())
+        names = []
+        rows = []
+        status_buckets = {}
+        
+        # One pass over the records: name, table row (field order of TABLE_DTYPE) and status bucket
+        for i, record in enumerate(records):
+            metrics = record['metrics']
+            status = record['status']
+            names.append(record['display_name'])
+            rows.append(
+                tuple(_numeric(metrics.get(field)) for field in METRIC_FIELDS)
+                + (_numeric(record.get('health_score')), _numeric(record.get('problem_count')),
+                   STATUS_CODES.get(status, UNKNOWN_STATUS))
+            )
+            status_buckets.setdefault(status, []).append(i)
+        table = np.array(rows, dtype=TABLE_DTYPE)
+        with_problems = np.flatnonzero(table['problem_count'] > 0).tolist()
+        
+        return {
+            'names': names,
+            'table': table,
+            'columns': {metric: table[metric] for metric in COLUMN_METRICS},
+            'sorted_idx': {},  # (metric, order) -> indices, filled lazily
+            'status_buckets': status_buckets,
+            'with_problems': with_problems,
+            'snapshot': tuple(records),
+            'name_index': {name.lower(): name for name in names},
+            'id_by_name': {r['display_name']: r['entity_id'] for r in records},
+        }
+    
+    def _publish(
+        self,
+        services: Dict,
+        problems_index: Dict,
+        aggregated_stats: Dict,
+        last_updated: datetime,
+        view: Dict
+    ):
+        """
+        Swap in a fully built KB
+        
+        Everything is computed before this runs and lands in one _KBData, so
+        publishing is a single reference assignment: readers see either the
+        previous build or the new one, never a mix, without taking a lock.
+        Writers (build/load) are already serialized by the build gate.
+        """
+        self._data = _KBData(
+            services, problems_index, aggregated_stats, last_updated,
+            self._data.version + 1, **view
+        )
+    
+    def current_data(self) -> _KBData:
+        """
+        Get the latest published build
+        
+        Pass it as data= to the query methods to answer a whole question from
+        one build, even if a new one is published meanwhile.
+        """
+        return self._data
+    
+    @property
+    def services(self) -> Dict:
+        """entity_id -> complete service data (current build)"""
+        return self._data.services
+    
+    @property
+    def problems_index(self) -> Dict:
+        """problem_id -> problem details (current build)"""
+        return self._data.problems_index
+    
+    @property
+    def aggregated_stats(self) -> Dict:
+        """Aggregate statistics (current build)"""
+        return self._data.aggregated_stats
+    
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        """When the current data was built (None until the first build/load)"""
+        return self._data.last_updated
+    
+    def _sorted_indices(self, data: _KBData, metric: str, order: str) -> np.ndarray:
+        """
+        Get service indices ordered by metric (services without a value excluded)
+        
+        Computed once per metric/order and reused until the next build.
+        """
+        key = (metric, order)
+        indices = data.sorted_idx.get(key)
+        if indices is None:
+            column = data.columns[metric]
+            valid = np.flatnonzero(~np.isnan(column))
+            values = column[valid] if order == 'asc' else -column[valid]
+            indices = valid[np.argsort(values, kind='stable')]
+            data.sorted_idx[key] = indices
+        return indices
+    
+    def rank_by_metric(
+        self,
+        metric: str,
+        order: str = 'desc',
+        limit: int = 5,
+        status: Optional[str] = None,
+        data: Optional[_KBData] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Get top services by a metric
+        
+        Args:
+            metric: One of COLUMN_METRICS
+            order: 'desc' (highest first) or 'asc'
+            limit: Number of services to return
+            status: Only rank services with this status (optional)
+            data: Build to read (from current_data()); defaults to the latest
+            
+        Returns:
+            Service records (services without a value are skipped),
+            or None if the metric is not tracked
+        """
+        if data is None:
+            data = self._data
+        if metric not in data.columns:
+            return None
+        
+        limit = max(limit, 0)
+        if status is None:
+            top = self._sorted_indices(data, metric, order)[:limit]
+        else:
+            # Status mask and metric from the same table, one pass
+            table = data.table
+            column = table[metric]
+            candidates = np.flatnonzero(
+                (table['status'] == STATUS_CODES.get(status, UNKNOWN_STATUS)) & ~np.isnan(column)
+            )
+            values = column[candidates] if order == 'asc' else -column[candidates]
+            top = candidates[np.argsort(values, kind='stable')[:limit]]
+        
+        snapshot = data.snapshot
+        return [snapshot[i] for i in top]
+    
+    def filter_by_metric(
+        self,
+        metric: str,
+        op: str,
+        threshold: float,
+        data: Optional[_KBData] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Get services whose metric is above ('>') or below ('<') a threshold
+        
+        Returns:
+            Matching service records (services without a value never match),
+            or None if the metric is not tracked
+        """
+        if data is None:
+            data = self._data
+        column = data.columns.get(metric)
+        if column is None:
+            return None
+        
+        mask = column > threshold if op == '>' else column < threshold
+        snapshot = data.snapshot
+        return [snapshot[i] for i in np.flatnonzero(mask)]
+    
+    def filter_by_status(self, status: str, data: Optional[_KBData] = None) -> List[Dict]:
+        """Get services with the given status ('healthy', 'warning', 'critical')"""
+        if data is None:
+            data = self._data
+        snapshot = data.snapshot
+        return [snapshot[i] for i in data.status_buckets.get(status, [])]
+    
+    def services_with_problems(self, data: Optional[_KBData] = None) -> List[Dict]:
+        """Get services with at least one open problem"""
+        if data is None:
+            data = self._data
+        snapshot = data.snapshot
+        return [snapshot[i] for i in data.with_problems]
+    
+    def _find_service(self, data: _KBData, service_name: str) -> Optional[Dict]:
+        """Look up a service in data by entity ID or display name"""
+        service = data.services.get(service_name)
+        if service is None:
+            entity_id = data.id_by_name.get(service_name)
+            if entity_id is not None:
+                service = data.services.get(entity_id)
+        return service
+    
+    def get_service(self, service_name: str, data: Optional[_KBData] = None) -> Optional[Dict]:
+        """Get complete data for a specific service (by entity ID or display name)"""
+        return self._find_service(self._data if data is None else data, service_name)
+    
+    def get_problems(self, service_name: str) -> List[Dict]:
+        """Get the open problems of a service (by entity ID or display name)"""
+        data = self._data
+        service = self._find_service(data, service_name)
+        if service is None:
+            return []
+        problems_index = data.problems_index
+        return [problems_index[problem_id] for problem_id in service.get('problem_ids', ())
+                if problem_id in problems_index]
     
     def get_all_services(self) -> Dict:
-        """Get all service data"""
-        return self.services
+        """Get all service data (entity_id -> record)"""
+        return self._data.services
+    
+    def all_service_names(self) -> List[str]:
+        """Get every service display name"""
+        return list(self._data.names)
+    
+    def service_name_index(self) -> Dict[str, str]:
+        """Get the lowercased name -> display name index (rebuilt with each build)"""
+        return self._data.name_index
     
-    def get_stats(self) -> Dict:
+    def snapshot(self) -> tuple:
+        """
+        Get all service records as a tuple
+        
+        The same tuple is returned until the next build, so callers can hold
+        on to it for a whole question without copying.
+        """
+        return self._data.snapshot
+    
+    def get_stats(self, data: Optional[_KBData] = None) -> Dict:
         """Get aggregate statistics"""
-        return self.aggregated_stats
+        return (self._data if data is None else data).aggregated_stats
+    
+    def version(self) -> int:
+        """Get data version (changes whenever a build completes)"""
+        return self._data.version
     
     def is_ready(self) -> bool:
         """Check if knowledge base is ready"""
@@ -370,10 +908,11 @@ class ServiceKnowledgeBase:
     
     def get_status(self) -> Dict:
         """Get knowledge base status"""
+        data = self._data
         return {
-            'is_ready': self.is_ready(),
+            'is_ready': data.last_updated is not None and not self.is_building,
             'is_building': self.is_building,
-            'last_updated': self.last_updated,
-            'service_count': len(self.services),
+            'last_updated': data.last_updated,
+            'service_count': len(data.services),
             'error': self.build_error
         }
@@ -0,0 +1,47 @@
+"""
+Rate Limiting Utilities
+Thread-safe token bucket for pacing outbound API calls
+"""
+import threading
+import time
+
+class TokenBucket:
+    """
+    Token bucket shared between worker threads
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() only blocks when the bucket is empty, so bursts go out at
+    full speed and sustained load settles at the refill rate.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens added per second (sustained requests/second)
+            capacity: Maximum tokens held (largest burst)
+        """
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        if capacity < 1:
+            raise ValueError(f"Token bucket capacity must be at least 1, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1):
+        """Take tokens, waiting until enough have refilled"""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        with self._cond:
+            self._refill()
+            while self._tokens < tokens:
+                self._cond.wait((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
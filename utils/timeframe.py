@@ -3,6 +3,7 @@ Timeframe Utilities
 Parse and convert various timeframe formats
 """
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Tuple
 import re
 
@@ -62,6 +63,7 @@ def timeframe_to_dynatrace(timeframe: str) -> str:
     
     return from_str, to_str
 
+@lru_cache(maxsize=32)
 def human_readable_timeframe(timeframe: str) -> str:
     """
     Convert timeframe to human-readable format